@@ -0,0 +1,67 @@
+"""
+Helpers shared by the tools which process whole directory trees: the command line tools
+(python_import_sorter.py, dmoj_markdown.py) and the editor commands built on them.
+
+Files are found with `iter_files`. The command line tools run a function on every file in
+worker processes with `map_in_processes`. The plugin host can not spawn worker processes,
+so the editor commands use the threads of `new_thread_pool` instead, which still overlap
+reading and writing files.
+"""
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Sequence, Tuple, TypeVar
+
+T = TypeVar('T')
+
+# directories which are never searched, besides hidden ones
+EXCLUDED_DIRS = {'__pycache__', 'node_modules', 'venv'}
+
+
+def iter_files(paths: Sequence[str], extensions: Tuple[str, ...]) -> Iterator[str]:
+    """
+    Files of `paths`: files are yielded as they are, directories are searched recursively
+    (in sorted order) for files with one of `extensions` (in lower case).
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+
+        for dir_path, dir_names, file_names in os.walk(path):
+            dir_names[:] = sorted(
+                dir_name for dir_name in dir_names
+                if not dir_name.startswith('.') and dir_name not in EXCLUDED_DIRS
+            )
+            for file_name in sorted(file_names):
+                if file_name.lower().endswith(extensions):
+                    yield os.path.join(dir_path, file_name)
+
+def add_jobs_argument(parser) -> None:
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='number of worker processes')
+
+def map_in_processes(func: Callable[..., T], jobs: int, *iterables: Iterable) -> List[T]:
+    """
+    Same as `map(func, *iterables)`, on `jobs` worker processes. `func` must be picklable,
+    e.g. a module-level function or a `functools.partial` of one.
+    """
+    columns = [list(iterable) for iterable in iterables]
+    num_items = min(len(column) for column in columns) if columns else 0
+    if jobs <= 1 or num_items <= 1:
+        return list(map(func, *columns))
+
+    # a few chunks per worker, so that workers with faster chunks get more of them
+    chunk_size = max(1, num_items // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(func, *columns, chunksize=chunk_size))
+
+def exit_status(check: bool, num_changed: int, num_errors: int, would_change: str) -> int:
+    """Exit status of a command line tool: 1 if some files failed, or would be changed with `--check`."""
+    if check and num_changed > 0:
+        print(f'{num_changed} file(s) {would_change}', file=sys.stderr)
+        return 1
+    return 1 if num_errors > 0 else 0
+
+def new_thread_pool(thread_name_prefix: str) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1), thread_name_prefix=thread_name_prefix)
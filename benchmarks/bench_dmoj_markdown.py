@@ -0,0 +1,92 @@
+"""
+Benchmark the DMOJ math conversion on large generated problem statements.
+
+Usage:
+    python benchmarks/bench_dmoj_markdown.py [--sizes 1 4 16]
+
+Sizes are in MB. The in-process converter is compared with the previous `sed` based
+conversion, which read the file from disk and piped it through a `sed` process.
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dmoj_markdown import from_dmoj, to_dmoj  # noqa: E402
+
+SED_TO_DMOJ = ['sed', '-r', '-e', r's/\$([^$]+)\$/~\1~/g', '-e', r's/\$~/$$/g', '-e', r's/~\$/$$/g']
+SED_FROM_DMOJ = ['sed', '-r', '-e', r's/~([^~]+)~/$\1$/g']
+
+FORMULAS = ['n', 'a_i', '1 \\le n \\le 10^5', 'x^2 + y^2']
+
+
+def generate_statement(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    paragraphs = []
+    length = 0
+    while length < size:
+        kind = rng.random()
+        if kind < 0.7:
+            paragraph = ' '.join(
+                f'${rng.choice(FORMULAS)}$' if rng.random() < 0.2 else 'word'
+                for _ in range(rng.randint(20, 80))
+            )
+        elif kind < 0.8:
+            paragraph = '$$\n\\sum_{i=1}^{n} a_i \\cdot b_i\n$$'
+        elif kind < 0.9:
+            paragraph = '```cpp\nint main() { long long $x$ = 0; }\n```'
+        else:
+            paragraph = 'Use `$` in `printf("$%d$")` and \\$5 here.'
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return '\n\n'.join(paragraphs) + '\n'
+
+def sed_convert(file_path: str, command: List[str]) -> str:
+    with open(file_path, 'r', encoding='utf-8') as file:
+        completed_process = subprocess.run(command, input=file.read().encode(), stdout=subprocess.PIPE)
+    return completed_process.stdout.decode()
+
+def best_of(func: Callable[[], object], repeat: int) -> float:
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f'{"size (MB)":>9} {"to dmoj (ms)":>13} {"sed (ms)":>9} {"from dmoj (ms)":>15} {"sed (ms)":>9}')
+    for size in args.sizes:
+        text = generate_statement(int(size * 1024 * 1024))
+        dmoj_text = to_dmoj(text)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            normal_path = os.path.join(temp_dir, 'normal.md')
+            dmoj_path = os.path.join(temp_dir, 'dmoj.md')
+            with open(normal_path, 'w', encoding='utf-8') as file:
+                file.write(text)
+            with open(dmoj_path, 'w', encoding='utf-8') as file:
+                file.write(dmoj_text)
+
+            to_dmoj_time = best_of(lambda: to_dmoj(text), args.repeat)
+            sed_to_dmoj_time = best_of(lambda: sed_convert(normal_path, SED_TO_DMOJ), args.repeat)
+            from_dmoj_time = best_of(lambda: from_dmoj(dmoj_text), args.repeat)
+            sed_from_dmoj_time = best_of(lambda: sed_convert(dmoj_path, SED_FROM_DMOJ), args.repeat)
+        print(
+            f'{size:>9g} {to_dmoj_time * 1000:>13.1f} {sed_to_dmoj_time * 1000:>9.1f}'
+            f' {from_dmoj_time * 1000:>15.1f} {sed_from_dmoj_time * 1000:>9.1f}'
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark sorting of large generated import sections (e.g. stubs, `__init__.py` re-exports).
+
+Usage:
+    python benchmarks/bench_python_import_sorter.py [--sizes 1000 5000 10000 50000]
+
+The current key based sorting is compared with the previous comparator based one
+(`cmp_to_key(node_cmp)` + `ast.dump()` deduplication).
+"""
+
+import argparse
+import ast
+import os
+import random
+import sys
+import time
+from functools import cmp_to_key
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from python_import_sorter import find_assoc_comment, sort_import_nodes, sort_import_section  # noqa: E402
+
+
+def generate_section(num_imports: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines = []
+    for idx in range(num_imports):
+        module = f'pkg_{rng.randrange(num_imports // 10 + 1)}.mod_{rng.randrange(50)}'
+        kind = rng.random()
+        if kind < 0.3:
+            lines.append(f'import {module}')
+        elif kind < 0.9:
+            names = ', '.join(f'name_{rng.randrange(1000)}' for _ in range(rng.randint(1, 4)))
+            lines.append(f'from {module} import {names}')
+        else:
+            # duplicate an earlier import
+            lines.append(lines[rng.randrange(len(lines))] if lines else f'import {module}')
+        if idx % 20 == 0:
+            lines[-1] += '  # noqa'
+    return '\n'.join(lines)
+
+def legacy_node_cmp(lhs, rhs) -> int:
+    lhs, rhs = lhs[0], rhs[0]
+    if isinstance(lhs, ast.Import) and isinstance(rhs, ast.Import):
+        return -1 if lhs.names[0].name < rhs.names[0].name else 1
+    elif isinstance(lhs, ast.ImportFrom) and isinstance(rhs, ast.ImportFrom):
+        if lhs.module != rhs.module:
+            return -1 if lhs.module < rhs.module else 1
+        lhs_names = [alias.name for alias in lhs.names]
+        rhs_names = [alias.name for alias in rhs.names]
+        return -1 if lhs_names < rhs_names else 1
+    return -1 if isinstance(lhs, ast.Import) else 1
+
+def legacy_sort_import_nodes(nodes, assoc_comments):
+    for node in nodes:
+        node.names = sorted(node.names, key=lambda alias: alias.name)
+    pairs = sorted(zip(nodes, assoc_comments), key=cmp_to_key(legacy_node_cmp))
+    return [
+        pair for idx, pair in enumerate(pairs)
+        if idx == 0 or ast.dump(pair[0]) != ast.dump(pairs[idx - 1][0])
+    ]
+
+def best_of(func: Callable[[], object], repeat: int) -> float:
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 10000, 50000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f'{"imports":>8} {"section (ms)":>14} {"sort (ms)":>11} {"legacy sort (ms)":>18}')
+    for size in args.sizes:
+        section = generate_section(size)
+        lines = section.split('\n')
+        tree = ast.parse(section)
+        assoc_comments = [find_assoc_comment(lines, node) for node in tree.body]
+
+        section_time = best_of(lambda: sort_import_section(section), args.repeat)
+        sort_time = best_of(lambda: sort_import_nodes(tree.body, assoc_comments), args.repeat)
+        legacy_sort_time = best_of(lambda: legacy_sort_import_nodes(tree.body, assoc_comments), args.repeat)
+        print(f'{size:>8} {section_time * 1000:>14.1f} {sort_time * 1000:>11.1f} {legacy_sort_time * 1000:>18.1f}')
+
+if __name__ == '__main__':
+    main()
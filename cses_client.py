@@ -0,0 +1,534 @@
+"""
+A small HTTP client for CSES, used by the http backend of `SubmitCsesCommand`.
+
+It only depends on the standard library: each client reuses one persistent connection
+for all of its requests, and cookies (the login session) are kept in a JSON file so that
+they survive restarts. `CsesClientPool` shares the login between several clients, so that
+solutions can be submitted (and their verdicts polled) concurrently. The base url can be
+changed, e.g. to a local server imitating the CSES login, submit and result pages
+(see tests/cses_stub_server.py).
+
+`ProblemCatalog` keeps the IDs, titles and categories of the problem set on disk, so that
+problems can be looked up without loading any page.
+"""
+
+import http.client
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from html.parser import HTMLParser
+from http.cookies import SimpleCookie
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode, urljoin, urlsplit
+
+CSES_URL = 'https://cses.fi'
+
+# judging is done once the status of a submission is one of these
+FINAL_STATUSES = ('READY',)
+
+# the problem set rarely changes, the catalog is refreshed after this many seconds
+CATALOG_MAX_AGE = 7 * 24 * 60 * 60
+
+
+class CsesError(Exception):
+    pass
+
+class Response(NamedTuple):
+    status: int
+    path: str
+    text: str
+
+class Form(NamedTuple):
+    action: str
+    inputs: Dict[str, str]
+    input_types: Dict[str, str]
+    selects: Dict[str, Dict[str, str]]  # select name -> option text -> option value
+
+class Problem(NamedTuple):
+    id: int
+    title: str
+    category: str
+
+class CsesPage(HTMLParser):
+    """
+    Extract the parts of a CSES page which are needed to log in, submit and read a verdict,
+    the problems of the problem set page and the examples of a task page.
+    """
+
+    def __init__(self, text: str) -> None:
+        super().__init__()
+        self.forms: List[Form] = []
+        self.logged_out = False
+        self.title: Optional[str] = None
+        self.verdict: Optional[str] = None
+        self.status: Optional[str] = None
+        self.test_times: List[float] = []
+        self.problems: List[Problem] = []
+        self.examples: List[str] = []  # inputs and outputs of the examples, in order
+
+        self._stack: List[Tuple[str, List[str]]] = []
+        self._capture: Optional[str] = None
+        self._captured: List[str] = []
+        self._select: Optional[str] = None
+        self._option_value: Optional[str] = None
+        self._prev_td_is_accepted = False
+        self._category = ''
+        self._problem_id: Optional[int] = None
+        self.feed(text)
+        self.close()
+
+    def handle_starttag(self, tag: str, attrs) -> None:
+        attributes = {name: value or '' for name, value in attrs}
+        classes = attributes.get('class', '').split()
+        if tag not in ('input', 'br', 'img', 'meta', 'link', 'hr'):
+            self._stack.append((tag, classes))
+
+        if tag == 'form':
+            self.forms.append(Form(attributes.get('action', ''), {}, {}, {}))
+        elif tag == 'input' and self.forms and 'name' in attributes:
+            self.forms[-1].inputs[attributes['name']] = attributes.get('value', '')
+            self.forms[-1].input_types[attributes['name']] = attributes.get('type', 'text')
+        elif tag == 'select' and self.forms and 'name' in attributes:
+            self._select = attributes['name']
+            self.forms[-1].selects[self._select] = {}
+        elif tag == 'option' and self._select is not None:
+            self._option_value = attributes.get('value')
+            self._start_capture('option')
+        elif tag == 'a' and 'account' in classes and attributes.get('href') == '/login':
+            self.logged_out = True
+        elif tag == 'h1' and self._inside('title-block'):
+            self._start_capture('title')
+        elif tag == 'h2':
+            self._start_capture('category')
+        elif tag == 'pre' and self._inside('content'):
+            self._start_capture('example')
+        elif tag == 'a' and re.fullmatch(r'/problemset/task/\d+/?', attributes.get('href', '')):
+            self._problem_id = int(re.sub(r'\D', '', attributes['href']))
+            self._start_capture('problem')
+        elif 'inline-score' in classes and 'verdict' in classes and self._inside('summary-table'):
+            self._start_capture('verdict')
+        elif attributes.get('id') == 'status':
+            self._start_capture('status')
+        elif tag == 'td':
+            if self._prev_td_is_accepted:
+                self._start_capture('test_time')
+            self._prev_td_is_accepted = 'verdict' in classes and 'ac' in classes
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == 'select':
+            self._select = None
+        if self._capture is not None and self._stack and self._stack[-1][0] == tag:
+            self._end_capture()
+        # pop up to the matching tag, this also handles unclosed tags
+        for idx in range(len(self._stack) - 1, -1, -1):
+            if self._stack[idx][0] == tag:
+                del self._stack[idx:]
+                break
+
+    def handle_data(self, data: str) -> None:
+        if self._capture is not None:
+            self._captured.append(data)
+
+    def handle_startendtag(self, tag: str, attrs) -> None:
+        # <br/> inside an example is a line break
+        if tag == 'br' and self._capture == 'example':
+            self._captured.append('\n')
+        else:
+            self.handle_starttag(tag, attrs)
+
+    def _inside(self, class_name: str) -> bool:
+        return any(class_name in classes for _, classes in self._stack)
+
+    def _start_capture(self, name: str) -> None:
+        self._capture = name
+        self._captured = []
+
+    def _end_capture(self) -> None:
+        text = ''.join(self._captured).strip()
+        if self._capture == 'example':
+            self.examples.append(text + '\n')
+        elif self._capture == 'option' and self._select is not None and self.forms:
+            self.forms[-1].selects[self._select][text] = self._option_value if self._option_value is not None else text
+        elif self._capture == 'title':
+            self.title = text
+        elif self._capture == 'verdict':
+            self.verdict = text
+        elif self._capture == 'status':
+            self.status = text
+        elif self._capture == 'category':
+            self._category = text
+        elif self._capture == 'problem' and self._problem_id is not None:
+            self.problems.append(Problem(self._problem_id, text, self._category))
+        elif self._capture == 'test_time':
+            try:
+                self.test_times.append(float(text.rstrip('s').strip()))
+            except ValueError:
+                pass
+        self._capture = None
+
+    def find_form(self, input_name: str) -> Optional[Form]:
+        for form in self.forms:
+            if input_name in form.inputs:
+                return form
+        return None
+
+class CsesClient:
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        base_url: str = CSES_URL,
+        cookie_path: Optional[str] = None,
+        timeout: float = 10,
+        cookies: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """`cookies` can be given to share them with other clients, they are loaded from `cookie_path` otherwise."""
+        self.username = username
+        self.password = password
+        self.base_url = base_url.rstrip('/')
+        self.cookie_path = cookie_path
+        self.timeout = timeout
+        self.cookies = cookies if cookies is not None else load_cookies(cookie_path)
+        self._connection: Optional[http.client.HTTPConnection] = None
+
+    def get(self, path: str) -> Response:
+        return self.request('GET', path)
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        max_redirects: int = 5,
+    ) -> Response:
+        """Send a request and follow redirects, cookies are sent and stored automatically."""
+        for _ in range(max_redirects + 1):
+            request_headers = dict(headers or {})
+            if self.cookies:
+                request_headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+            status, response_headers, data = self._send(method, path, body, request_headers)
+            self._store_cookies(response_headers.get_all('Set-Cookie') or [])
+
+            location = response_headers.get('Location')
+            if status in (301, 302, 303, 307, 308) and location:
+                path = self._path_of(urljoin(self.base_url + path, location))
+                if status in (301, 302, 303):
+                    method, body, headers = 'GET', None, None
+                continue
+
+            charset = response_headers.get_content_charset() or 'utf-8'
+            return Response(status, path, data.decode(charset, errors='replace'))
+        raise CsesError(f'Too many redirects: {path}')
+
+    def login(self) -> None:
+        page = CsesPage(self.get('/login').text)
+        form = page.find_form('pass')
+        if form is None:
+            raise CsesError('Login form not found')
+
+        fields = dict(form.inputs)
+        fields['nick'] = self.username
+        fields['pass'] = self.password
+        response = self.request(
+            'POST',
+            self._path_of(urljoin(self.base_url + '/login', form.action or '/login')),
+            urlencode(fields).encode(),
+            {'Content-Type': 'application/x-www-form-urlencoded'},
+        )
+        if CsesPage(response.text).logged_out:
+            raise CsesError('Login failed, check your username and password')
+
+    def open_logged_in(self, path: str) -> CsesPage:
+        """Open a page, logging in first if needed."""
+        page = CsesPage(self.get(path).text)
+        if page.logged_out:
+            self.login()
+            page = CsesPage(self.get(path).text)
+        return page
+
+    def submit(
+        self,
+        problem_id: int,
+        solution_path: str,
+        language: str = 'C++',
+        option: str = 'C++20',
+    ) -> Tuple[Optional[str], str]:
+        """Submit a solution, returns the problem title and the path of the result page."""
+        submit_path = f'/problemset/submit/{problem_id}/'
+        page = self.open_logged_in(submit_path)
+        form = page.find_form('file')
+        if form is None:
+            raise CsesError(f'Submit form not found for problem {problem_id}')
+
+        # fill in the same fields as the submit form in a browser
+        fields = {
+            name: value for name, value in form.inputs.items()
+            if form.input_types.get(name) not in ('file', 'submit')
+        }
+        fields['lang'] = form.selects.get('lang', {}).get(language, language)
+        fields['option'] = form.selects.get('option', {}).get(option, option)
+        with open(solution_path, 'rb') as f:
+            file_content = f.read()
+
+        body, content_type = encode_multipart(fields, 'file', os.path.basename(solution_path), file_content)
+        response = self.request(
+            'POST',
+            self._path_of(urljoin(self.base_url + submit_path, form.action or submit_path)),
+            body,
+            {'Content-Type': content_type},
+        )
+        return page.title, response.path
+
+    def get_result(self, result_path: str) -> CsesPage:
+        return CsesPage(self.get(result_path).text)
+
+    def get_examples(self, problem_id: int) -> List[Tuple[str, str]]:
+        """(input, output) pairs of the examples in a problem statement, this does not need a login."""
+        examples = CsesPage(self.get(f'/problemset/task/{problem_id}/').text).examples
+        return list(zip(examples[::2], examples[1::2]))
+
+    def get_problems(self) -> List[Problem]:
+        """Problems of the problem set, this does not need a login."""
+        problems = CsesPage(self.get('/problemset/list/').text).problems
+        if not problems:
+            raise CsesError('No problems found in the problem set')
+        return problems
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _send(self, method: str, path: str, body: Optional[bytes], headers: Dict[str, str]):
+        try:
+            return self._send_once(method, path, body, headers)
+        except (http.client.HTTPException, OSError):
+            # the server may have closed the kept-alive connection, reconnect once
+            self.close()
+        try:
+            return self._send_once(method, path, body, headers)
+        except (http.client.HTTPException, OSError) as e:
+            self.close()
+            raise CsesError(f'Request to {path} failed: {e}') from e
+
+    def _send_once(self, method: str, path: str, body: Optional[bytes], headers: Dict[str, str]):
+        if self._connection is None:
+            self._connection = self._connect()
+        self._connection.request(method, path, body=body, headers=headers)
+        response = self._connection.getresponse()
+        return response.status, response.headers, response.read()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        url = urlsplit(self.base_url)
+        if url.scheme == 'https':
+            return http.client.HTTPSConnection(url.netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(url.netloc, timeout=self.timeout)
+
+    def _path_of(self, url: str) -> str:
+        parts = urlsplit(url)
+        if parts.netloc and parts.netloc != urlsplit(self.base_url).netloc:
+            raise CsesError(f'Unexpected redirect to {url}')
+        return (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+
+    def _store_cookies(self, set_cookie_headers: List[str]) -> None:
+        if not set_cookie_headers:
+            return
+        for header in set_cookie_headers:
+            cookie = SimpleCookie()
+            cookie.load(header)
+            for name, morsel in cookie.items():
+                if morsel['max-age'] == '0' or morsel.value == 'deleted':
+                    self.cookies.pop(name, None)
+                else:
+                    self.cookies[name] = morsel.value
+
+        if self.cookie_path is not None:
+            save_cookies(self.cookie_path, self.cookies)
+
+class CsesClientPool:
+    """
+    Clients of one account sharing their login cookies. Each client has its own connection,
+    so up to `max_size` requests can be in flight at the same time.
+    """
+
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        base_url: str = CSES_URL,
+        cookie_path: Optional[str] = None,
+        max_size: int = 4,
+    ) -> None:
+        self.username = username
+        self.password = password
+        self.base_url = base_url
+        self.cookie_path = cookie_path
+        self.max_size = max_size
+        self.cookies = load_cookies(cookie_path)
+        self._idle_clients: List[CsesClient] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def client(self) -> Iterator[CsesClient]:
+        with self._lock:
+            if self._idle_clients:
+                client = self._idle_clients.pop()
+            else:
+                client = CsesClient(
+                    self.username,
+                    self.password,
+                    self.base_url,
+                    cookie_path=self.cookie_path,
+                    cookies=self.cookies,
+                )
+        try:
+            yield client
+        finally:
+            with self._lock:
+                if len(self._idle_clients) < self.max_size:
+                    self._idle_clients.append(client)
+                else:
+                    client.close()
+
+    def submit(self, problem_id: int, solution_path: str, language: str = 'C++', option: str = 'C++20'):
+        with self.client() as client:
+            return client.submit(problem_id, solution_path, language, option)
+
+    def wait_for_verdict(
+        self,
+        result_path: str,
+        timeout: float = 600,
+        interval: float = 0.5,
+        max_interval: float = 8,
+        on_status: Optional[Callable[[str], None]] = None,
+    ) -> CsesPage:
+        """
+        Poll the result page until judging is done or `timeout` seconds have passed, waiting
+        twice as long (up to `max_interval` seconds) after each poll. `on_status` is called
+        every time the status of the submission (e.g. PENDING, TESTING) changes.
+        """
+        deadline = time.monotonic() + timeout
+        status: Optional[str] = None
+        while True:
+            # the connection is not held while waiting, so other submissions can use it
+            with self.client() as client:
+                result = client.get_result(result_path)
+            if result.verdict is not None or result.status in FINAL_STATUSES:
+                return result
+
+            if result.status is not None and result.status != status:
+                status = result.status
+                if on_status is not None:
+                    on_status(status)
+            if time.monotonic() + interval > deadline:
+                return result
+            time.sleep(interval)
+            interval = min(interval * 2, max_interval)
+
+    def close(self) -> None:
+        with self._lock:
+            for client in self._idle_clients:
+                client.close()
+            self._idle_clients.clear()
+
+class ProblemCatalog:
+    """The problems of the problem set, kept in a JSON file and refreshed only when asked or stale."""
+
+    def __init__(self, path: str, max_age: float = CATALOG_MAX_AGE) -> None:
+        self.path = path
+        self.max_age = max_age
+        self.fetched_at = 0.0
+        self.problems: Dict[int, Problem] = {}
+        if os.path.isfile(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.fetched_at = data['fetched_at']
+                self.problems = {problem[0]: Problem(*problem) for problem in data['problems']}
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f'Failed to load problem catalog: {e}')
+
+    def is_stale(self) -> bool:
+        return not self.problems or time.time() - self.fetched_at > self.max_age
+
+    def refresh(self, client: CsesClient) -> None:
+        problems = client.get_problems()
+        # replaced at once, so the catalog can be read from other threads meanwhile
+        self.problems = {problem.id: problem for problem in problems}
+        self.fetched_at = time.time()
+        temp_path = f'{self.path}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'fetched_at': self.fetched_at, 'problems': [list(problem) for problem in problems]}, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f'Failed to save problem catalog: {e}')
+
+    def get(self, problem_id: int) -> Optional[Problem]:
+        return self.problems.get(problem_id)
+
+    def guess(self, file_path: str) -> Optional[int]:
+        """
+        Guess the problem of a solution file, from a problem ID in its name
+        (e.g. 1068.cpp, cses_1068_a.cpp) or from its name being the title (e.g. weird_algorithm.cpp).
+        """
+        file_stem = os.path.splitext(os.path.basename(file_path))[0]
+        for number in re.findall(r'\d+', file_stem):
+            if int(number) in self.problems:
+                return int(number)
+
+        key = normalize_title(file_stem)
+        for problem in self.problems.values():
+            if normalize_title(problem.title) == key:
+                return problem.id
+        return None
+
+def normalize_title(title: str) -> str:
+    return re.sub(r'[^a-z0-9]', '', title.lower())
+
+def load_cookies(cookie_path: Optional[str]) -> Dict[str, str]:
+    if cookie_path is None or not os.path.isfile(cookie_path):
+        return {}
+    try:
+        with open(cookie_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f'Failed to load cookies: {e}')
+        return {}
+
+def save_cookies(cookie_path: str, cookies: Dict[str, str]) -> None:
+    # write to a temporary file first, clients of a pool may save at the same time
+    temp_path = f'{cookie_path}.{threading.get_ident()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(cookie_path), exist_ok=True)
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(cookies), f)
+        os.replace(temp_path, cookie_path)
+    except OSError as e:
+        print(f'Failed to save cookies: {e}')
+
+def encode_multipart(
+    fields: Dict[str, str],
+    file_field: str,
+    file_name: str,
+    file_content: bytes,
+) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{file_name}"\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'.encode()
+    )
+    parts.append(file_content)
+    parts.append(f'\r\n--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
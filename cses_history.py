@@ -0,0 +1,105 @@
+"""
+History of CSES submissions, kept in a SQLite database, used by `SubmitCsesCommand`.
+
+Submissions are indexed by problem ID and source hash, so that submitting the same source
+to the same problem again can be answered with the verdict it already got.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY,
+    problem_id INTEGER NOT NULL,
+    source_hash TEXT NOT NULL,
+    language TEXT NOT NULL,
+    option TEXT NOT NULL,
+    verdict TEXT,
+    test_times TEXT NOT NULL,
+    solution_path TEXT NOT NULL,
+    submitted_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS submissions_by_problem ON submissions (problem_id, source_hash);
+'''
+
+
+class Submission(NamedTuple):
+    problem_id: int
+    source_hash: str
+    language: str
+    option: str
+    verdict: Optional[str]
+    test_times: List[float]
+    solution_path: str
+    submitted_at: float
+
+class SubmissionStore:
+    """A SQLite database of submissions, can be used from any thread."""
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.executescript(SCHEMA)
+
+    def add(self, submission: Submission) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT INTO submissions (problem_id, source_hash, language, option, verdict, test_times, '
+                'solution_path, submitted_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (*submission[:5], json.dumps(submission.test_times), *submission[6:]),
+            )
+
+    def find(self, problem_id: int, source_hash: str, language: str, option: str) -> Optional[Submission]:
+        """The latest judged submission of the same source to the same problem."""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT * FROM submissions WHERE problem_id = ? AND source_hash = ? AND language = ? AND option = ? '
+                'AND verdict IS NOT NULL ORDER BY submitted_at DESC LIMIT 1',
+                (problem_id, source_hash, language, option),
+            ).fetchone()
+        return to_submission(row) if row is not None else None
+
+    def list(self, problem_id: Optional[int] = None, limit: int = 200) -> List[Submission]:
+        """Submissions of a problem (or of all problems), the latest first."""
+        with self._lock:
+            if problem_id is None:
+                rows = self._connection.execute(
+                    'SELECT * FROM submissions ORDER BY submitted_at DESC LIMIT ?', (limit,),
+                ).fetchall()
+            else:
+                rows = self._connection.execute(
+                    'SELECT * FROM submissions WHERE problem_id = ? ORDER BY submitted_at DESC LIMIT ?',
+                    (problem_id, limit),
+                ).fetchall()
+        return [to_submission(row) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+def to_submission(row) -> Submission:
+    # the first column is the row id
+    return Submission(row[1], row[2], row[3], row[4], row[5], json.loads(row[6]), row[7], row[8])
+
+def hash_source(solution_path: str) -> str:
+    with open(solution_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def new_submission(
+    problem_id: int,
+    solution_path: str,
+    source_hash: str,
+    verdict: Optional[str],
+    test_times: List[float],
+    language: str = 'C++',
+    option: str = 'C++20',
+) -> Submission:
+    return Submission(problem_id, source_hash, language, option, verdict, test_times, solution_path, time.time())
@@ -0,0 +1,177 @@
+"""
+Judge a CSES solution locally before it is submitted, used by `SubmitCsesCommand`.
+
+Compiled binaries are cached by the hash of the source and of the compile command, so a
+solution is only compiled again after it changed. Tests (the examples of the problem
+statement and custom tests) are plain `NAME.in`/`NAME.out` files in a directory, they are
+run in parallel, each with a time and a memory limit.
+"""
+
+import functools
+import glob
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+# the limits of most CSES problems
+TIME_LIMIT = 1.0  # seconds
+MEMORY_LIMIT = 512 * 1024 * 1024  # bytes
+
+DEFAULT_COMPILE_COMMAND = ('g++', '-std=c++20', '-O2', '-pipe')
+
+# number of compiled binaries kept in the cache
+BINARY_CACHE_SIZE = 64
+
+# `prlimit` of util-linux, runs a command with resource limits
+PRLIMIT_PATH = shutil.which('prlimit')
+
+ACCEPTED = 'ACCEPTED'
+WRONG_ANSWER = 'WRONG ANSWER'
+TIME_LIMIT_EXCEEDED = 'TIME LIMIT EXCEEDED'
+RUNTIME_ERROR = 'RUNTIME ERROR'
+
+
+class JudgeError(Exception):
+    pass
+
+class TestCase(NamedTuple):
+    name: str
+    input: str
+    output: str
+
+class TestResult(NamedTuple):
+    name: str
+    verdict: str
+    time: float
+    output: str
+
+def compile_solution(
+    source_path: str,
+    cache_dir: str,
+    compile_command: Sequence[str] = DEFAULT_COMPILE_COMMAND,
+) -> Tuple[str, bool]:
+    """
+    Compile a solution, or reuse the binary of an identical source compiled with the same
+    command. Returns the path of the binary and whether it was compiled.
+    """
+    with open(source_path, 'rb') as f:
+        source = f.read()
+    key = hashlib.sha256('\0'.join(compile_command).encode() + b'\0' + source).hexdigest()
+    # the compiler runs in the directory of the source, a relative path would be resolved from there
+    cache_dir = os.path.abspath(cache_dir)
+    binary_path = os.path.join(cache_dir, key + ('.exe' if os.name == 'nt' else ''))
+    if os.path.isfile(binary_path):
+        # mark it as recently used so it is not pruned
+        os.utime(binary_path)
+        return binary_path, False
+
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_path = f'{binary_path}.{threading.get_ident()}.tmp'
+    # compile in the directory of the source, so that local headers are found
+    process = subprocess.run(
+        [*compile_command, os.path.basename(source_path), '-o', temp_path],
+        cwd=os.path.dirname(os.path.abspath(source_path)),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+    )
+    if process.returncode != 0:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise JudgeError(f'Compilation failed:\n{process.stdout}')
+    os.replace(temp_path, binary_path)
+    prune_binaries(cache_dir)
+    return binary_path, True
+
+def prune_binaries(cache_dir: str, max_size: int = BINARY_CACHE_SIZE) -> None:
+    """Remove the least recently used binaries, keeping at most `max_size` of them."""
+    entries = [entry for entry in os.scandir(cache_dir) if entry.is_file() and not entry.name.endswith('.tmp')]
+    if len(entries) <= max_size:
+        return
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    for entry in entries[:len(entries) - max_size]:
+        try:
+            os.remove(entry.path)
+        except OSError as e:
+            print(f'Failed to remove cached binary: {e}')
+
+def load_tests(test_dir: str) -> List[TestCase]:
+    """Tests of a directory, every `NAME.in` file with a matching `NAME.out` file is a test."""
+    tests = []
+    for input_path in sorted(glob.glob(os.path.join(glob.escape(test_dir), '*.in'))):
+        output_path = input_path[:-len('.in')] + '.out'
+        if not os.path.isfile(output_path):
+            continue
+        with open(input_path, 'r', encoding='utf-8') as f:
+            test_input = f.read()
+        with open(output_path, 'r', encoding='utf-8') as f:
+            test_output = f.read()
+        tests.append(TestCase(os.path.basename(input_path)[:-len('.in')], test_input, test_output))
+    return tests
+
+def save_tests(test_dir: str, examples: List[Tuple[str, str]]) -> None:
+    os.makedirs(test_dir, exist_ok=True)
+    for idx, (test_input, test_output) in enumerate(examples, start=1):
+        with open(os.path.join(test_dir, f'example_{idx}.in'), 'w', encoding='utf-8') as f:
+            f.write(test_input)
+        with open(os.path.join(test_dir, f'example_{idx}.out'), 'w', encoding='utf-8') as f:
+            f.write(test_output)
+
+def run_tests(
+    binary_path: str,
+    tests: List[TestCase],
+    time_limit: float = TIME_LIMIT,
+    memory_limit: int = MEMORY_LIMIT,
+    max_workers: Optional[int] = None,
+) -> List[TestResult]:
+    """Run the tests in parallel, results are in the same order as `tests`."""
+    if max_workers is None:
+        # more runs than cores would slow each other down and cause false time limit verdicts
+        max_workers = os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tests)))) as executor:
+        return list(executor.map(lambda test: run_test(binary_path, test, time_limit, memory_limit), tests))
+
+def run_test(binary_path: str, test: TestCase, time_limit: float, memory_limit: int) -> TestResult:
+    # tests are started from several threads at once, in a process with many other threads (e.g. the
+    # plugin host), so the forked child must not run python code which may take a lock (like an import)
+    command = [binary_path]
+    preexec_fn = None
+    if PRLIMIT_PATH is not None:
+        command = [PRLIMIT_PATH, f'--as={memory_limit}', '--', binary_path]
+    elif resource is not None:
+        preexec_fn = functools.partial(resource.setrlimit, resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+    start_time = time.perf_counter()
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        universal_newlines=True,
+        preexec_fn=preexec_fn,
+    )
+    try:
+        output, _ = process.communicate(test.input, timeout=time_limit)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        return TestResult(test.name, TIME_LIMIT_EXCEEDED, time.perf_counter() - start_time, '')
+    elapsed_time = time.perf_counter() - start_time
+
+    if process.returncode != 0:
+        # exceeding the memory limit makes allocations fail, so it ends up here as well
+        return TestResult(test.name, RUNTIME_ERROR, elapsed_time, output)
+    verdict = ACCEPTED if output.split() == test.output.split() else WRONG_ANSWER
+    return TestResult(test.name, verdict, elapsed_time, output)
+
@@ -0,0 +1,228 @@
+"""
+Convert inline math between normal Markdown (`$...$`) and DMOJ-style Markdown (`~...~`).
+
+The text is scanned once. Fenced code blocks, inline code, display math (`$$...$$`) and
+escaped delimiters (`\\$`, `\\~`) are left as they are. Like in the previous `sed` based
+conversion, inline math must be non-empty and can not span multiple lines.
+
+It can also be run as a script to convert every .md file of directory trees in parallel:
+    python dmoj_markdown.py [--restore] [--check] [-j JOBS] PATH...
+A manifest (.dmoj-manifest.json in the current directory by default) records the files
+which are already converted, unchanged files are skipped without being read again.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from functools import partial
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from .batch_processing import add_jobs_argument, exit_status, iter_files, map_in_processes
+except ImportError:
+    # run as a script
+    from batch_processing import add_jobs_argument, exit_status, iter_files, map_in_processes
+
+NORMAL_DELIMITER = '$'
+DMOJ_DELIMITER = '~'
+
+MANIFEST_NAME = '.dmoj-manifest.json'
+
+# every part of the text which has to be seen to find inline math, in a single regex so that
+# the text is scanned once. Everything but inline math is only matched to be skipped.
+TOKEN_PATTERN = r"""
+    # most characters can not start a token, this check avoids trying every branch on them
+    (?=[{0}$`\\\n~]|\A)
+    (?:
+        (?P<math>{0}(?:[^{0}\\\n]|\\[^\n])+{0})
+        # fenced code block, up to the closing fence or the end of the text
+        | (?:\A|\n)[ ]{{0,3}}(?:
+            (?P<backticks>`{{3,}})[^\n]*(?:.*?\n[ ]{{0,3}}(?P=backticks)`*[ \t]*(?=\n|\Z)|.*)
+            | (?P<tildes>~{{3,}})[^\n]*(?:.*?\n[ ]{{0,3}}(?P=tildes)~*[ \t]*(?=\n|\Z)|.*)
+        )
+        # code span, it ends with a backtick run of the same length in the same paragraph
+        | (?<!`)(?P<ticks>`+)(?!`)(?:(?!\n[ \t]*\n).)*?(?<!`)(?P=ticks)(?!`)
+        | `+
+        # display math
+        | \$\$.*?(?<!\\)\$\$
+        | \$\$
+        # escaped character, or a doubled `~` (strikethrough)
+        | \\. | {0}{0}
+    )
+"""
+TOKEN_RES = {
+    delimiter: re.compile(TOKEN_PATTERN.format(re.escape(delimiter)), re.DOTALL | re.VERBOSE)
+    for delimiter in (NORMAL_DELIMITER, DMOJ_DELIMITER)
+}
+
+
+def find_math_delimiters(text: str, delimiter: str) -> List[int]:
+    """Offsets of the opening and closing `delimiter` of every inline math, in increasing order."""
+    offsets: List[int] = []
+    for match in TOKEN_RES[delimiter].finditer(text):
+        if match.lastgroup == 'math':
+            offsets.append(match.start())
+            offsets.append(match.end() - 1)
+    return offsets
+
+def replace_delimiters(text: str, offsets: List[int], new_delimiter: str) -> str:
+    parts = []
+    prev = 0
+    for offset in offsets:
+        parts.append(text[prev:offset])
+        parts.append(new_delimiter)
+        prev = offset + 1
+    parts.append(text[prev:])
+    return ''.join(parts)
+
+def to_dmoj(text: str) -> str:
+    return replace_delimiters(text, find_math_delimiters(text, NORMAL_DELIMITER), DMOJ_DELIMITER)
+
+def from_dmoj(text: str) -> str:
+    return replace_delimiters(text, find_math_delimiters(text, DMOJ_DELIMITER), NORMAL_DELIMITER)
+
+def convert_file(file_path: str, dmoj: bool = True, check: bool = False) -> Tuple[bool, str]:
+    """
+    Convert a Markdown file in place to DMOJ-style (or back if `dmoj` is False), unless `check` is True.
+
+    Returns whether the file is (or would be) changed, and the hash of its converted content.
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    text = data.decode('utf-8')
+    # keep the line endings of the file as they are
+    newline = '\r\n' if '\r\n' in text else '\n'
+    convert = to_dmoj if dmoj else from_dmoj
+    new_data = convert(text.replace('\r\n', '\n')).replace('\n', newline).encode('utf-8')
+    if new_data == data:
+        return False, hash_content(data)
+
+    if not check:
+        with open(file_path, 'wb') as f:
+            f.write(new_data)
+    return True, hash_content(new_data)
+
+def hash_content(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def iter_markdown_files(paths: Sequence[str]) -> Iterator[str]:
+    return iter_files(paths, ('.md',))
+
+class ConversionManifest:
+    """
+    Files which are already converted, by absolute path: their format, content hash, size and
+    modification time. A file whose size and modification time did not change is skipped
+    without being read, a file which was only touched is skipped after its hash is checked.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        if os.path.isfile(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f'Failed to load manifest {path}: {e}', file=sys.stderr)
+
+    def is_unchanged(self, file_path: str, dmoj: bool) -> bool:
+        """Whether the file is known to be converted and was not modified since."""
+        entry = self.entries.get(os.path.abspath(file_path))
+        if entry is None or entry['dmoj'] != dmoj:
+            return False
+        stat = os.stat(file_path)
+        return entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns
+
+    def known_hash(self, file_path: str, dmoj: bool) -> Optional[str]:
+        entry = self.entries.get(os.path.abspath(file_path))
+        return entry['hash'] if entry is not None and entry['dmoj'] == dmoj else None
+
+    def record(self, file_path: str, dmoj: bool, content_hash: str) -> None:
+        stat = os.stat(file_path)
+        self.entries[os.path.abspath(file_path)] = {
+            'dmoj': dmoj,
+            'hash': content_hash,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+        }
+
+    def save(self) -> None:
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f'Failed to save manifest {self.path}: {e}', file=sys.stderr)
+
+def convert_file_if_changed(
+    file_path: str,
+    known_hash: Optional[str],
+    dmoj: bool,
+    check: bool,
+) -> Tuple[str, bool, Optional[str], Optional[str]]:
+    """
+    Convert a file unless its content is `known_hash` (the hash it had once converted).
+
+    Returns the file path, whether it changed, the hash of its converted content and an error.
+    """
+    try:
+        if known_hash is not None:
+            with open(file_path, 'rb') as f:
+                content_hash = hash_content(f.read())
+            if content_hash == known_hash:
+                return file_path, False, content_hash, None
+        changed, content_hash = convert_file(file_path, dmoj, check)
+        return file_path, changed, content_hash, None
+    except (UnicodeDecodeError, OSError) as e:
+        return file_path, False, None, str(e)
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Convert inline math of Markdown files to DMOJ-style Markdown.')
+    parser.add_argument('paths', nargs='+', help='Markdown files or directories to convert recursively')
+    parser.add_argument('--restore', action='store_true', help='convert DMOJ-style Markdown back to normal Markdown')
+    parser.add_argument('--check', action='store_true', help='only report files which are not converted')
+    add_jobs_argument(parser)
+    parser.add_argument('--manifest', default=MANIFEST_NAME, help=f'manifest file (default: {MANIFEST_NAME})')
+    parser.add_argument('--no-manifest', action='store_true', help='convert every file, without reading or writing a manifest')
+    args = parser.parse_args(argv)
+    dmoj = not args.restore
+
+    manifest = None if args.no_manifest else ConversionManifest(args.manifest)
+    file_paths = []
+    num_skipped = 0
+    for file_path in iter_markdown_files(args.paths):
+        if manifest is not None and manifest.is_unchanged(file_path, dmoj):
+            num_skipped += 1
+        else:
+            file_paths.append(file_path)
+    known_hashes = [manifest.known_hash(file_path, dmoj) if manifest is not None else None for file_path in file_paths]
+
+    worker = partial(convert_file_if_changed, dmoj=dmoj, check=args.check)
+    results = map_in_processes(worker, args.jobs, file_paths, known_hashes)
+
+    num_changed = 0
+    num_errors = 0
+    for file_path, changed, content_hash, error in results:
+        if error is not None:
+            num_errors += 1
+            print(f'error: {file_path}: {error}', file=sys.stderr)
+            continue
+        if changed:
+            num_changed += 1
+            print(f'{"Would convert" if args.check else "Converted"} {file_path}')
+        if manifest is not None and content_hash is not None and not (args.check and changed):
+            manifest.record(file_path, dmoj, content_hash)
+    if manifest is not None:
+        manifest.save()
+    if num_skipped > 0:
+        print(f'Skipped {num_skipped} unchanged file(s)')
+
+    return exit_status(args.check, num_changed, num_errors, 'would be converted')
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""
+Resolve .editorconfig properties of files, with the parsed .editorconfig files cached.
+
+`editorconfig.get_properties` walks up the directory tree and parses every .editorconfig
+on the way for each file. Here, each .editorconfig is parsed once (and again only after it
+is modified), and the chain of .editorconfig files of a directory is cached, so resolving
+the properties of another file in a known directory only takes a few `stat` calls to check
+that none of the files in the chain was created, modified or removed.
+
+The sections are matched with `editorconfig.fnmatch`, the same way as `editorconfig.get_properties`.
+"""
+
+import os
+import posixpath
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from editorconfig.exceptions import ParsingError
+from editorconfig.fnmatch import fnmatch
+
+CONFIG_FILE_NAME = '.editorconfig'
+
+SECTION_RE = re.compile(r'\s*\[(?P<header>(?:[^#;]|\\#|\\;)+)\]')
+OPTION_RE = re.compile(r'\s*(?P<option>[^:=\s][^:=]*)\s*[:=]\s*(?P<value>.*)$')
+# `;` and `#` start an inline comment only after a space
+INLINE_COMMENT_RE = re.compile(r'(.*?) [;#]')
+
+# values of these properties are case insensitive
+LOWERCASE_PROPERTIES = (
+    'end_of_line',
+    'indent_style',
+    'indent_size',
+    'insert_final_newline',
+    'trim_trailing_whitespace',
+    'charset',
+)
+
+
+class ConfigFile(NamedTuple):
+    path: str
+    root: bool
+    sections: List[Tuple[str, 'OrderedDict[str, str]']]
+
+class ConfigChain(NamedTuple):
+    # every place a .editorconfig may be at, with its modification time (None if there is none)
+    candidates: List[Tuple[str, Optional[int]]]
+    # the .editorconfig files which exist, the top-most first
+    files: List[ConfigFile]
+
+class EditorConfigResolver:
+    """Thread-safe cache of parsed .editorconfig files and of the .editorconfig chain of each directory."""
+
+    def __init__(self) -> None:
+        self._files: Dict[str, Tuple[int, ConfigFile]] = {}
+        self._chains: Dict[str, ConfigChain] = {}
+        self._lock = threading.Lock()
+
+    def get_properties(self, file_path: str) -> 'OrderedDict[str, str]':
+        """Same as `editorconfig.get_properties`."""
+        file_path = os.path.abspath(file_path)
+        return resolve_properties(self.get_chain(os.path.dirname(file_path)), file_path)
+
+    def get_chain(self, dir_path: str) -> ConfigChain:
+        """The .editorconfig files of a directory, files of the directory can then be resolved with `resolve_properties`."""
+        with self._lock:
+            chain = self._chains.get(dir_path)
+        if chain is not None and all(get_mtime(path) == mtime for path, mtime in chain.candidates):
+            return chain
+
+        chain = self._build_chain(dir_path)
+        with self._lock:
+            self._chains[dir_path] = chain
+        return chain
+
+    def _build_chain(self, dir_path: str) -> ConfigChain:
+        candidates: List[Tuple[str, Optional[int]]] = []
+        files: List[ConfigFile] = []
+        while True:
+            config_path = os.path.join(dir_path, CONFIG_FILE_NAME)
+            mtime = get_mtime(config_path)
+            candidates.append((config_path, mtime))
+            if mtime is not None:
+                config_file = self._get_file(config_path, mtime)
+                files.append(config_file)
+                if config_file.root:
+                    break
+
+            parent_path = os.path.dirname(dir_path)
+            if parent_path == dir_path:
+                break
+            dir_path = parent_path
+
+        files.reverse()
+        return ConfigChain(candidates, files)
+
+    def _get_file(self, config_path: str, mtime: int) -> ConfigFile:
+        with self._lock:
+            entry = self._files.get(config_path)
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+
+        config_file = parse_config_file(config_path)
+        with self._lock:
+            self._files[config_path] = (mtime, config_file)
+        return config_file
+
+def resolve_properties(chain: ConfigChain, file_path: str) -> 'OrderedDict[str, str]':
+    properties: 'OrderedDict[str, str]' = OrderedDict()
+    for config_file in chain.files:
+        for glob, options in config_file.sections:
+            if matches_glob(config_file.path, glob, file_path):
+                properties.update(options)
+    return preprocess_properties(properties)
+
+def get_mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def parse_config_file(config_path: str) -> ConfigFile:
+    """
+    Parse a .editorconfig file, with the same rules as `editorconfig.ini.EditorConfigParser`,
+    quirks included: only lines starting with `#` or `;` are comments, an indented one is an
+    option or a parsing error.
+    """
+    root = False
+    sections: List[Tuple[str, 'OrderedDict[str, str]']] = []
+    errors = []
+    with open(config_path, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    if lines and lines[0].startswith('\ufeff'):
+        lines[0] = lines[0][1:]
+
+    for line_number, line in enumerate(lines, start=1):
+        if line.strip() == '' or line[0] in '#;':
+            continue
+
+        section_match = SECTION_RE.match(line)
+        if section_match is not None:
+            sections.append((section_match.group('header'), OrderedDict()))
+            continue
+
+        option_match = OPTION_RE.match(line)
+        if option_match is None:
+            errors.append((line_number, line))
+            continue
+        option = option_match.group('option').rstrip().lower()
+        value = option_match.group('value')
+        comment_match = INLINE_COMMENT_RE.search(value)
+        if comment_match is not None:
+            value = comment_match.group(1)
+        value = value.strip()
+        if value == '""':
+            value = ''
+
+        if sections:
+            sections[-1][1][option] = value
+        elif option == 'root':
+            # preamble
+            root = value.lower() == 'true'
+
+    if errors:
+        error = ParsingError(config_path)
+        for line_number, line in errors:
+            error.append(line_number, repr(line))
+        raise error
+    return ConfigFile(config_path, root, sections)
+
+def matches_glob(config_path: str, glob: str, file_path: str) -> bool:
+    config_dir = os.path.normpath(os.path.dirname(config_path)).replace(os.sep, '/')
+    glob = glob.replace('\\#', '#').replace('\\;', ';')
+    if '/' in glob:
+        if glob.startswith('/'):
+            glob = glob[1:]
+        glob = posixpath.join(config_dir, glob)
+    else:
+        glob = posixpath.join('**/', glob)
+    return fnmatch(os.path.normpath(file_path).replace(os.sep, '/'), glob)
+
+def preprocess_properties(properties: 'OrderedDict[str, str]') -> 'OrderedDict[str, str]':
+    for name in LOWERCASE_PROPERTIES:
+        if name in properties:
+            properties[name] = properties[name].lower()
+
+    if properties.get('indent_style') == 'tab' and 'indent_size' not in properties:
+        properties['indent_size'] = 'tab'
+    if 'indent_size' in properties and 'tab_width' not in properties and properties['indent_size'] != 'tab':
+        properties['tab_width'] = properties['indent_size']
+    if properties.get('indent_size') == 'tab' and 'tab_width' in properties:
+        properties['indent_size'] = properties['tab_width']
+    return properties
@@ -0,0 +1,164 @@
+"""
+File operations which never overwrite an existing file and never leave a partial file behind.
+
+A new file is written to a temporary file in the destination directory first, then linked
+to its final name with `os.link`, which fails if the name is already taken (unlike
+`os.rename`, which silently replaces it), so there is no gap between checking and writing.
+
+Copies are made by the kernel: a reflink (copy-on-write clone) where the file system
+supports it (btrfs, XFS, ...), otherwise `shutil.copyfile`, which uses `sendfile` on Linux
+and `fcopyfile` on macOS. The content never goes through Python strings.
+
+A file is moved by linking it to its new name and removing the old name, which is as
+atomic as `os.rename` but does not replace an existing file. Across file systems, where
+neither works, it is copied in chunks (with progress) to a temporary file, linked to its
+new name, then removed.
+"""
+
+import errno
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+
+# ioctl request of Linux to clone a file, from linux/fs.h
+FICLONE = 0x40049409
+
+# errors of os.link on file systems without hard links
+LINK_UNSUPPORTED_ERRNOS = (errno.EPERM, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOSYS, errno.EINVAL)
+
+# bytes copied between two progress reports when moving a file across file systems
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+# called with the number of bytes copied so far and the size of the file
+ProgressCallback = Callable[[int, int], None]
+
+
+def create_file(path: str) -> None:
+    """Create an empty file, FileExistsError if there is one already."""
+    os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+
+def copy_file(src_path: str, dst_path: str) -> None:
+    """Copy a file (content and permission bits) to a new file, FileExistsError if `dst_path` exists."""
+    with temporary_file(dst_path) as temp_path:
+        copy_file_content(src_path, temp_path)
+        shutil.copymode(src_path, temp_path)
+        link_no_clobber(temp_path, dst_path)
+
+def write_file(dst_path: str, content: bytes, mode_path: str) -> None:
+    """
+    Write `content` to a new file with the permission bits of `mode_path`,
+    FileExistsError if `dst_path` exists.
+    """
+    with temporary_file(dst_path) as temp_path:
+        with open(temp_path, 'wb') as file:
+            file.write(content)
+        # the temporary file is only readable by its owner
+        shutil.copymode(mode_path, temp_path)
+        link_no_clobber(temp_path, dst_path)
+
+def move_file(src_path: str, dst_path: str, on_progress: Optional[ProgressCallback] = None) -> None:
+    """Move a file, FileExistsError if `dst_path` exists. `on_progress` is only called across file systems."""
+    try:
+        os.link(src_path, dst_path)
+    except FileExistsError:
+        raise
+    except OSError as e:
+        if e.errno == errno.EXDEV:
+            with temporary_file(dst_path) as temp_path:
+                copy_file_chunked(src_path, temp_path, on_progress)
+                shutil.copystat(src_path, temp_path)
+                link_no_clobber(temp_path, dst_path)
+        elif e.errno in LINK_UNSUPPORTED_ERRNOS:
+            # same file system without hard links: reserve the name, then rename over it
+            create_file(dst_path)
+            try:
+                os.replace(src_path, dst_path)
+            except OSError:
+                os.unlink(dst_path)
+                raise
+            return
+        else:
+            raise
+    os.unlink(src_path)
+
+def copy_file_chunked(src_path: str, dst_path: str, on_progress: Optional[ProgressCallback] = None) -> None:
+    """Copy the content of a file chunk by chunk, with `sendfile` where possible."""
+    with open(src_path, 'rb') as src_file, open(dst_path, 'wb') as dst_file:
+        size = os.fstat(src_file.fileno()).st_size
+        copied = 0
+        use_sendfile = hasattr(os, 'sendfile') and sys.platform.startswith('linux')
+        while True:
+            if use_sendfile:
+                try:
+                    num_bytes = os.sendfile(dst_file.fileno(), src_file.fileno(), copied, COPY_CHUNK_SIZE)
+                except OSError as e:
+                    if copied > 0 or e.errno not in (errno.EINVAL, errno.ENOSYS, errno.ENOTSUP):
+                        raise
+                    use_sendfile = False
+                    continue
+            else:
+                chunk = src_file.read(COPY_CHUNK_SIZE)
+                dst_file.write(chunk)
+                num_bytes = len(chunk)
+            if num_bytes == 0:
+                break
+            copied += num_bytes
+            if on_progress is not None:
+                on_progress(copied, size)
+
+def copy_file_content(src_path: str, dst_path: str) -> None:
+    if not reflink(src_path, dst_path):
+        shutil.copyfile(src_path, dst_path)
+
+def reflink(src_path: str, dst_path: str) -> bool:
+    """Clone a file without copying its data, returns False if the file system does not support it."""
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return False
+    try:
+        with open(src_path, 'rb') as src_file, open(dst_path, 'wb') as dst_file:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        return True
+    except OSError:
+        return False
+
+def link_no_clobber(src_path: str, dst_path: str) -> None:
+    """Give the file at `src_path` the name `dst_path` as well, FileExistsError if `dst_path` exists."""
+    try:
+        os.link(src_path, dst_path)
+        return
+    except FileExistsError:
+        raise
+    except OSError as e:
+        if e.errno not in LINK_UNSUPPORTED_ERRNOS:
+            raise
+
+    # no hard links (e.g. FAT, some network file systems): reserve the name, then replace it
+    create_file(dst_path)
+    try:
+        os.replace(src_path, dst_path)
+    except OSError:
+        os.unlink(dst_path)
+        raise
+
+@contextmanager
+def temporary_file(path: str) -> Iterator[str]:
+    """Path of a new temporary file next to `path`, removed on exit unless it was moved."""
+    dir_name, base_name = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{base_name}.', suffix='.tmp', dir=dir_name or '.')
+    os.close(fd)
+    try:
+        yield temp_path
+    finally:
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass
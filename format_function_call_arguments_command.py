@@ -8,12 +8,21 @@ For instance:
         2,
         x=[1, 2, 3],
     )
+
+Commas inside nested brackets and strings do not split arguments. With several cursors,
+every call with a cursor is formatted at once.
 """
 
 import sublime
 import sublime_plugin
 
-from typing import List, Literal
+import re
+from typing import List, Literal, Optional, Tuple
+
+FUNC_CALL_SELECTORS = [
+    'meta.function-call.arguments.python',
+]
+LAMBDA_RE = re.compile(r'lambda\b')
 
 
 class FormatFunctionCallArgumentsCommand(sublime_plugin.TextCommand):
@@ -23,39 +32,23 @@ class FormatFunctionCallArgumentsCommand(sublime_plugin.TextCommand):
 
     def run(self, edit: sublime.Edit, option: Literal['split', 'join']):
         view = self.view
-        func_call_selectors = [
-            'meta.function-call.arguments.python',
-        ]
         use_spaces = view.settings().get('translate_tabs_to_spaces', False)
         tab_size = view.settings().get('tab_size', 4)
         tab_chars = " " * tab_size if use_spaces else '\t'
-        
-        new_regions: List[sublime.Region] = []
-        for region in view.sel():
-            for selector in func_call_selectors:
-                if (
-                    view.match_selector(region.begin(), selector) and
-                    view.match_selector(region.end(), selector)
-                ):
-                    break
-            else:
-                continue
 
-            # get correct scope name
-            scope_name = view.scope_name(region.begin())
-            right_index = -1
-            for selector in func_call_selectors:
-                right_index = scope_name.rfind(selector)
-                if right_index != -1:
-                    break
-            assert right_index != -1
-            scope_name = scope_name[:right_index + len(selector)]
-            arguments_region = view.expand_to_scope(region.begin(), scope_name)
-            if arguments_region is None:
+        # format every call first, then replace them all from the end of the view,
+        # so that the regions which are not replaced yet do not move
+        replacements: List[Tuple[sublime.Region, str, str]] = []
+        for arguments_region in find_arguments_regions(view):
+            text = view.substr(arguments_region)
+            func_call_arguments = parse_arguments(text)
+            if func_call_arguments is None:
+                # comments would be joined into the code, or the call is incomplete
                 continue
 
-            func_call_arguments = parse_arguments(view, arguments_region)
             if option == 'split':
+                if not func_call_arguments:
+                    continue
                 indent_level = view.indentation_level(arguments_region.begin())
                 arg_indent = tab_chars * (indent_level + 1)
                 parenthesis_indent = tab_chars * indent_level
@@ -72,14 +65,105 @@ class FormatFunctionCallArgumentsCommand(sublime_plugin.TextCommand):
             else:
                 continue
 
-            view.replace(edit, arguments_region, formated_arguments_str)
-            new_regions.append(sublime.Region(arguments_region.begin() + len(formated_arguments_str) - 1))
+            replacements.append((arguments_region, text, formated_arguments_str))
+
+        new_regions: List[sublime.Region] = []
+        offset_delta = 0
+        for arguments_region, _, formated_arguments_str in replacements:
+            new_end = arguments_region.begin() + offset_delta + len(formated_arguments_str)
+            new_regions.append(sublime.Region(new_end - 1))
+            offset_delta += len(formated_arguments_str) - arguments_region.size()
+        for arguments_region, text, formated_arguments_str in reversed(replacements):
+            if text != formated_arguments_str:
+                view.replace(edit, arguments_region, formated_arguments_str)
+
+        if new_regions:
+            view.sel().clear()
+            view.sel().add_all(new_regions)
+
+def find_arguments_regions(view: sublime.View) -> List[sublime.Region]:
+    """Regions of the arguments (parentheses included) of the calls with a selection, without overlaps."""
+    regions: List[sublime.Region] = []
+    for region in view.sel():
+        # several cursors in the same call
+        if regions and regions[-1].contains(region):
+            continue
+
+        for selector in FUNC_CALL_SELECTORS:
+            if (
+                view.match_selector(region.begin(), selector) and
+                view.match_selector(region.end(), selector)
+            ):
+                break
+        else:
+            continue
+
+        # get correct scope name
+        scope_name = view.scope_name(region.begin())
+        right_index = -1
+        for selector in FUNC_CALL_SELECTORS:
+            right_index = scope_name.rfind(selector)
+            if right_index != -1:
+                break
+        assert right_index != -1
+        scope_name = scope_name[:right_index + len(selector)]
+        arguments_region = view.expand_to_scope(region.begin(), scope_name)
+        if arguments_region is not None:
+            regions.append(arguments_region)
+
+    # a call containing another one is formatted, not both
+    regions.sort(key=lambda region: (region.begin(), -region.end()))
+    result: List[sublime.Region] = []
+    for region in regions:
+        if not result or region.begin() >= result[-1].end():
+            result.append(region)
+    return result
 
-        view.sel().clear()
-        self.view.sel().add_all(new_regions)
+def parse_arguments(text: str) -> Optional[List[str]]:
+    """
+    Top-level arguments of `(...)`, commas inside brackets and strings do not split arguments.
+    None if the arguments contain a comment or are not balanced.
+    """
+    arguments: List[str] = []
+    depth = 0
+    lambda_depths: List[int] = []  # depths of the lambdas whose parameters are being read
+    quote = ''
+    start = 1  # ignore '('
+    i = 1
+    end = len(text) - 1  # ignore ')'
+    while i < end:
+        char = text[i]
+        if quote:
+            if char == '\\':
+                i += 1
+            elif text.startswith(quote, i):
+                i += len(quote) - 1
+                quote = ''
+        elif char in '\'"':
+            quote = char * 3 if text.startswith(char * 3, i) else char
+            i += len(quote) - 1
+        elif char == '#':
+            return None
+        elif char in '([{':
+            depth += 1
+        elif char in ')]}':
+            depth -= 1
+            if depth < 0:
+                return None
+            while lambda_depths and lambda_depths[-1] > depth:
+                lambda_depths.pop()
+        elif char == 'l' and LAMBDA_RE.match(text, i) and not (text[i - 1].isalnum() or text[i - 1] == '_'):
+            # commas between `lambda` and `:` separate its parameters
+            lambda_depths.append(depth)
+            i += len('lambda') - 1
+        elif char == ':' and lambda_depths and lambda_depths[-1] == depth:
+            lambda_depths.pop()
+        elif char == ',' and depth == 0 and not lambda_depths:
+            arguments.append(text[start:i].strip())
+            start = i + 1
+        i += 1
 
-def parse_arguments(view: sublime.View, region: sublime.Region) -> List[str]:
-    text = view.substr(region)[1:-1]  # ignore '(' and ')'
-    arguments = [arg.strip() for arg in text.split(',')]
-    arguments = [arg for arg in arguments if arg]
-    return arguments
+    if quote or depth != 0:
+        return None
+    arguments.append(text[start:end].strip())
+    return [arg for arg in arguments if arg]
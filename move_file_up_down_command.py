@@ -1,9 +1,26 @@
-"""Move file of current view to parent directory."""
+"""
+Move file of current view to parent directory.
+
+The files of all selected tabs (or of all tabs in a group, with `group`, -1 for the active
+group) are moved at once, after a single confirmation. A file is never moved over an
+existing one. Moves across file systems are copied in the background, with the progress
+on the status bar. The views of the moved files are retargeted to the new paths.
+"""
 
 import sublime
 import sublime_plugin
 
 import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from . import file_operations
+
+# seconds between two progress updates on the status bar
+PROGRESS_INTERVAL = 0.2
+# moves listed in the confirmation dialog
+MAX_LISTED_MOVES = 10
 
 
 def _go_up(path: str, level: int = 1) -> str:
@@ -17,30 +34,85 @@ def _go_up(path: str, level: int = 1) -> str:
     return new_path
 
 class MoveFileUpCommand(sublime_plugin.WindowCommand):
-    def run(self, level: int = 1):
-        view = self.window.active_view()
-        assert view is not None
+    def run(self, level: int = 1, group: Optional[int] = None):
+        moves = []
+        for file_name in self.get_file_names(group):
+            file_basename = os.path.basename(file_name)
 
-        file_name = view.file_name()
-        assert file_name is not None
-        file_basename = os.path.basename(file_name)
+            dir_name = os.path.dirname(file_name)
+            new_dir_name = _go_up(dir_name, level)
+            new_file_name = os.path.join(new_dir_name, file_basename)
+            if new_file_name != file_name:
+                moves.append((file_name, new_file_name))
+        if not moves:
+            return
 
-        dir_name = os.path.dirname(file_name)
-        new_dir_name = _go_up(dir_name, level)
-        new_file_name = os.path.join(new_dir_name, file_basename)
+        if len(moves) == 1:
+            message = f'Move file to {moves[0][1]}?'
+        else:
+            message = f'Move {len(moves)} files?\n\n' + '\n'.join(
+                f'{file_name} -> {new_file_name}' for file_name, new_file_name in moves[:MAX_LISTED_MOVES]
+            )
+            if len(moves) > MAX_LISTED_MOVES:
+                message += f'\n... and {len(moves) - MAX_LISTED_MOVES} more'
 
-        if sublime.ok_cancel_dialog(f'Move file to {new_file_name}?'):
-            try:
-                if os.path.isfile(new_file_name):
-                    raise OSError('file already exists')
+        if sublime.ok_cancel_dialog(message):
+            threading.Thread(target=self.move_files, args=(moves,), daemon=True).start()
+
+    def is_enabled(self, level: int = 1, group: Optional[int] = None) -> bool:
+        return len(self.get_file_names(group)) > 0
+
+    def get_file_names(self, group: Optional[int]) -> List[str]:
+        if group is None:
+            views = [sheet.view() for sheet in self.window.selected_sheets()]
+        else:
+            views = self.window.views_in_group(self.window.active_group() if group == -1 else group)
 
-                os.rename(file_name, new_file_name)
-                view.retarget(new_file_name) 
+        file_names: List[str] = []
+        for view in views:
+            file_name = view.file_name() if view is not None else None
+            if file_name is not None and file_name not in file_names:
+                file_names.append(file_name)
+        return file_names
+
+    def move_files(self, moves: List[Tuple[str, str]]):
+        errors = []
+        last_progress_time = 0.0
+        for index, (file_name, new_file_name) in enumerate(moves):
+            prefix = f'Moving {os.path.basename(file_name)}' if len(moves) == 1 else f'Moving {index + 1}/{len(moves)}'
+
+            def on_progress(copied: int, size: int):
+                nonlocal last_progress_time
+                now = time.monotonic()
+                if now - last_progress_time >= PROGRESS_INTERVAL:
+                    last_progress_time = now
+                    message = f'{prefix}: {copied * 100 // max(size, 1)}%'
+                    sublime.set_timeout(lambda: self.window.status_message(message))
+
+            try:
+                file_operations.move_file(file_name, new_file_name, on_progress)
+            except FileExistsError:
+                errors.append(f'{new_file_name}: file already exists')
+                continue
             except OSError as e:
-                sublime.status_message('Unable to move file: ' + str(e))
-            except:
-                sublime.status_message('Unable to move file')
+                errors.append(f'{file_name}: {e}')
+                continue
+            sublime.set_timeout(lambda file_name=file_name, new_file_name=new_file_name: retarget_views(file_name, new_file_name))
+
+        if errors:
+            for error in errors:
+                print(f'Unable to move file {error}')
+            if len(errors) == 1:
+                message = 'Unable to move file ' + errors[0]
+            else:
+                message = f'Unable to move {len(errors)} of {len(moves)} files (see console)'
+        else:
+            message = f'Moved {len(moves)} file(s)'
+        sublime.set_timeout(lambda: self.window.status_message(message))
 
-    def is_enabled(self) -> bool:
-        view = self.window.active_view()
-        return view is not None and view.file_name() is not None
+def retarget_views(file_name: str, new_file_name: str):
+    """Point every view of a file, in every window, to its new path."""
+    for window in sublime.windows():
+        for view in window.views():
+            if view.file_name() == file_name:
+                view.retarget(new_file_name)
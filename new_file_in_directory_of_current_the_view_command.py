@@ -1,12 +1,159 @@
-"""Create new file/Duplicate file in the same directory of the current view."""
+"""
+Create new file/Duplicate file in the same directory of the current view.
+
+Files are duplicated in the background, with a kernel-side copy (see file_operations.py),
+so binary files and files in any encoding are copied as they are. With `from_buffer`,
+the content of the view is duplicated instead, unsaved changes included.
+
+While typing the file name, existing subdirectories matching the typed directory (fuzzily,
+e.g. `sr/cmp` for `src/components`) are suggested in the preview. They come from an index of
+the window's folders, which is built in the background (for the windows already open when
+the plugin is loaded too) and refreshed incrementally, so typing never waits on the file
+system. Directories indexed while the file name is typed are suggested as they come.
+"""
 
 import sublime
 import sublime_plugin
 
+import html
 import os
-from typing import List, Tuple, Union
+import re
+import threading
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from . import file_operations
+from .batch_processing import EXCLUDED_DIRS
+
+# directories listed per root at most, to bound the time and memory of huge folders
+MAX_INDEXED_DIRS = 50000
+MAX_SUGGESTIONS = 5
+
+# encodings of sublime text -> (python codec, BOM), other encodings are saved as UTF-8
+ENCODINGS = {
+    'UTF-8': ('utf-8', b''),
+    'UTF-8 with BOM': ('utf-8', b'\xef\xbb\xbf'),
+    'UTF-16 LE with BOM': ('utf-16-le', b'\xff\xfe'),
+    'UTF-16 BE with BOM': ('utf-16-be', b'\xfe\xff'),
+    'Western (Windows 1252)': ('cp1252', b''),
+    'Western (ISO 8859-1)': ('latin-1', b''),
+}
+LINE_ENDINGS = {'Unix': '\n', 'Windows': '\r\n', 'CR': '\r'}
 
 
+class DirectoryIndex:
+    """
+    Directories under some roots (e.g. the folders of a window), listed with `os.scandir` in
+    the background. A refresh only lists the directories whose modification time changed,
+    the other ones are only checked with `stat`.
+    """
+
+    def __init__(self) -> None:
+        self._mtimes: Dict[str, int] = {}  # directory -> modification time when it was listed
+        self._children: Dict[str, List[str]] = {}  # directory -> paths of its subdirectories
+        self._refreshing: Set[str] = set()
+        self._lock = threading.Lock()
+        # incremented on every change, to tell whether subdirectories() may have changed
+        self.version = 0
+
+    def refresh_async(self, roots: List[str]) -> None:
+        for root in roots:
+            with self._lock:
+                if root in self._refreshing:
+                    continue
+                self._refreshing.add(root)
+            threading.Thread(target=self._refresh, args=(root,), daemon=True).start()
+
+    def subdirectories(self, dir_path: str) -> List[str]:
+        """Paths of the known directories under `dir_path` (recursively), relative to it. It only reads memory."""
+        result = []
+        with self._lock:
+            stack = [(child, os.path.basename(child)) for child in reversed(self._children.get(dir_path, []))]
+            while stack:
+                child, relative_path = stack.pop()
+                result.append(relative_path)
+                for grandchild in reversed(self._children.get(child, [])):
+                    stack.append((grandchild, f'{relative_path}/{os.path.basename(grandchild)}'))
+        return result
+
+    def _refresh(self, root: str) -> None:
+        try:
+            stack = [root]
+            num_dirs = 0
+            while stack and num_dirs < MAX_INDEXED_DIRS:
+                dir_path = stack.pop()
+                num_dirs += 1
+                try:
+                    mtime = os.stat(dir_path).st_mtime_ns
+                except OSError:
+                    with self._lock:
+                        self._forget(dir_path)
+                        self.version += 1
+                    continue
+
+                with self._lock:
+                    children = self._children.get(dir_path)
+                    is_changed = children is None or self._mtimes.get(dir_path) != mtime
+                if is_changed:
+                    new_children = list_subdirectories(dir_path)
+                    with self._lock:
+                        for removed_child in set(children or []) - set(new_children):
+                            self._forget(removed_child)
+                        self._mtimes[dir_path] = mtime
+                        self._children[dir_path] = new_children
+                        self.version += 1
+                    children = new_children
+                stack.extend(children or [])
+        finally:
+            with self._lock:
+                self._refreshing.discard(root)
+
+    def _forget(self, dir_path: str) -> None:
+        """Remove a directory and everything under it, must be called with `_lock` held."""
+        stack = [dir_path]
+        while stack:
+            path = stack.pop()
+            self._mtimes.pop(path, None)
+            stack.extend(self._children.pop(path, []))
+
+directory_index = DirectoryIndex()
+
+def list_subdirectories(dir_path: str) -> List[str]:
+    try:
+        with os.scandir(dir_path) as entries:
+            return sorted(
+                entry.path for entry in entries
+                if entry.is_dir(follow_symlinks=False)
+                and not entry.name.startswith('.')
+                and entry.name not in EXCLUDED_DIRS
+            )
+    except OSError:
+        return []
+
+def fuzzy_match(query: str, candidates: List[str], limit: int = MAX_SUGGESTIONS) -> List[str]:
+    """Candidates containing the characters of `query` in order, the most compact matches first."""
+    pattern = re.compile('.*?'.join(f'({re.escape(char)})' for char in query), re.IGNORECASE)
+    scored = []
+    for candidate in candidates:
+        match = pattern.search(candidate)
+        if match is not None:
+            scored.append((match.end() - match.start(), len(candidate), candidate))
+    scored.sort()
+    return [candidate for _, _, candidate in scored[:limit]]
+
+def shorten_dir(dir_path: str, opened_folders: Optional[List[str]]) -> str:
+    """Directory path to show, relative to its folder (`@/folder/...`) or to the home directory (`~/...`)."""
+    if opened_folders is not None:
+        for folder in opened_folders:
+            if dir_path == folder or dir_path.startswith(os.path.join(folder, '')):
+                dir_base_name = os.path.basename(folder)
+                return '@/' + dir_path[len(folder) - len(dir_base_name):]
+
+    # os.getlogin() fails without a controlling terminal, and the home directory is not always /home/USER
+    home_dir = os.path.expanduser('~')
+    if dir_path == home_dir or dir_path.startswith(os.path.join(home_dir, '')):
+        return '~' + dir_path[len(home_dir):]
+    return dir_path
+
 class FileNameInputHandler(sublime_plugin.TextInputHandler):
     def __init__(self, view: sublime.View, opened_folders: Union[List[str], None] = None):
         self.new_file_base_name = 'new_file'
@@ -14,18 +161,21 @@ class FileNameInputHandler(sublime_plugin.TextInputHandler):
         cur_view_file_name = view.file_name() or view.name()
         self.ext = os.path.splitext(cur_view_file_name)[1]
 
-        self.cur_dir = os.path.dirname(cur_view_file_name)
-        if opened_folders is not None:
-            for folder in opened_folders:
-                if self.cur_dir.startswith(folder):
-                    dir_base_name = os.path.basename(folder)
-                    self.cur_dir = '@/' + self.cur_dir[len(folder) - len(dir_base_name):]
-                    break
+        cur_dir = os.path.dirname(cur_view_file_name)
+        self.cur_dir = shorten_dir(cur_dir, opened_folders)
 
-        logged_user = os.getlogin()
-        if self.cur_dir.startswith(f'/home/{logged_user}'):
-            self.cur_dir = self.cur_dir.replace(f'/home/{logged_user}', '~')
+        self.abs_cur_dir = cur_dir
+        self.index_version = -1
+        self.subdirectories: List[str] = []
+        self.subdirectory_set: Set[str] = set()
+        self.update_subdirectories()
 
+    def update_subdirectories(self) -> None:
+        """Take the subdirectories from the index again, only if it changed: preview() is called on every keystroke."""
+        if directory_index.version != self.index_version:
+            self.index_version = directory_index.version
+            self.subdirectories = directory_index.subdirectories(self.abs_cur_dir)
+            self.subdirectory_set = set(self.subdirectories)
 
     def name(self) -> str:
         return 'file_name'
@@ -43,12 +193,36 @@ class FileNameInputHandler(sublime_plugin.TextInputHandler):
 
     def preview(self, text: str) -> sublime.Html:
         cur_path = os.path.join(self.cur_dir, text)
-        return sublime.Html(f'<strong>{cur_path}</strong>')
+        content = f'<strong>{html.escape(cur_path)}</strong>'
+
+        typed_dir = os.path.dirname(text).strip('/')
+        self.update_subdirectories()
+        if typed_dir and typed_dir not in self.subdirectory_set:
+            suggestions = fuzzy_match(typed_dir, self.subdirectories)
+            if suggestions:
+                content += '<br>Existing directories: ' + ', '.join(
+                    f'<code>{html.escape(suggestion)}/</code>' for suggestion in suggestions
+                )
+            else:
+                content += '<br>New directory'
+        return sublime.Html(content)
 
     def validate(self, text: str) -> bool:
         return len(text) > 0
 
 
+def encode_view_content(view: sublime.View) -> bytes:
+    """Content of a view as it would be saved, with its line endings and encoding."""
+    content = view.substr(sublime.Region(0, view.size()))
+    line_ending = LINE_ENDINGS.get(view.line_endings(), '\n')
+    if line_ending != '\n':
+        content = content.replace('\n', line_ending)
+    codec, bom = ENCODINGS.get(view.encoding(), ('utf-8', b''))
+    return bom + content.encode(codec)
+
+def any_contains(folders: List[str], path: str) -> bool:
+    return any(path == folder or path.startswith(os.path.join(folder, '')) for folder in folders)
+
 class NewFileInDirectoryOfTheCurrentViewCommand(sublime_plugin.WindowCommand):
     def is_enabled(self) -> bool:
         """
@@ -63,41 +237,69 @@ class NewFileInDirectoryOfTheCurrentViewCommand(sublime_plugin.WindowCommand):
 
         return True
 
-    def run(self, file_name: str, duplicate_file: bool = False):
+    def run(self, file_name: str, duplicate_file: bool = False, from_buffer: bool = False):
+        """
+        With `duplicate_file`, the new file is a copy of the file of the current view,
+        or of the content of the view (unsaved changes included) with `from_buffer`.
+        """
         view = self.window.active_view()
         assert view is not None
 
         cur_view_file_name = view.file_name()
         assert cur_view_file_name is not None
 
-
         branch, leaf = os.path.split(cur_view_file_name)
         new_file_path = os.path.join(branch, file_name)
 
-        try:
-            if os.path.isfile(new_file_path):
-                raise OSError('file already exists')
+        content = None
+        if duplicate_file and from_buffer:
+            try:
+                content = encode_view_content(view)
+            except UnicodeEncodeError as e:
+                sublime.status_message('Unable to create file: ' + str(e))
+                return
 
+        # copying a large file must not block the UI
+        threading.Thread(
+            target=self.create_file,
+            args=(cur_view_file_name, new_file_path, duplicate_file, content),
+            daemon=True,
+        ).start()
+
+    def create_file(self, cur_view_file_name: str, new_file_path: str, duplicate_file: bool, content: Optional[bytes]):
+        try:
             new_dirname = os.path.dirname(new_file_path)
             if not os.path.exists(new_dirname):
                 os.makedirs(new_dirname)
-            open(new_file_path, 'w').close()  # create new file
-
-            # how do I copy the content of the current view to the new file?
-            if duplicate_file:
-                with open(cur_view_file_name, 'r') as f:
-                    content = f.read()
-                    with open(new_file_path, 'w') as new_f:
-                        new_f.write(content)
-                self.window.status_message('Duplicated file: ' + new_file_path)
+                directory_index.refresh_async([os.path.dirname(cur_view_file_name)])
+
+            # the new file is only linked to its name once it is complete, and never replaces an existing file
+            if content is not None:
+                file_operations.write_file(new_file_path, content, cur_view_file_name)
+                message = 'Duplicated buffer: '
+            elif duplicate_file:
+                file_operations.copy_file(cur_view_file_name, new_file_path)
+                message = 'Duplicated file: '
             else:
-                self.window.status_message('Created file: ' + new_file_path)
-            self.window.open_file(new_file_path)
+                file_operations.create_file(new_file_path)
+                message = 'Created file: '
 
+        except FileExistsError:
+            sublime.set_timeout(lambda: sublime.status_message('Unable to create file: file already exists'))
+            return
         except OSError as e:
-            sublime.status_message('Unable to create file: ' + str(e))
+            error = str(e)
+            sublime.set_timeout(lambda: sublime.status_message('Unable to create file: ' + error))
+            return
         except:
-            sublime.status_message('Unable to create file')
+            sublime.set_timeout(lambda: sublime.status_message('Unable to create file'))
+            return
+
+        def open_file():
+            self.window.status_message(message + new_file_path)
+            self.window.open_file(new_file_path)
+
+        sublime.set_timeout(open_file)
 
     def input(self, args) -> Union[sublime_plugin.TextInputHandler, None]:
         view = self.window.active_view()
@@ -105,9 +307,27 @@ class NewFileInDirectoryOfTheCurrentViewCommand(sublime_plugin.WindowCommand):
             return None
 
         if 'file_name' not in args:
-            return FileNameInputHandler(view, self.window.folders())
+            # the handler uses what is already indexed, and picks up what the refresh finds meanwhile
+            cur_dir = os.path.dirname(view.file_name())
+            folders = self.window.folders()
+            directory_index.refresh_async(folders if any_contains(folders, cur_dir) else folders + [cur_dir])
+            return FileNameInputHandler(view, folders)
 
         return None
 
     def input_description(self) -> str:
         return 'New file'
+
+
+class DirectoryIndexListener(sublime_plugin.EventListener):
+    def on_load_project_async(self, window: sublime.Window):
+        directory_index.refresh_async(window.folders())
+
+    def on_post_window_command(self, window: sublime.Window, command_name: str, args):
+        if command_name == 'refresh_folder_list':
+            directory_index.refresh_async(window.folders())
+
+def plugin_loaded():
+    # on_load_project_async is not called for the windows which are already open
+    for window in sublime.windows():
+        directory_index.refresh_async(window.folders())
@@ -0,0 +1,691 @@
+"""
+Editor-independent core of the python import sorter.
+
+It is used by `SortPythonImportsCommand` and can also be run from the command line
+to sort imports of every python file in a directory tree, e.g.:
+    python python_import_sorter.py src/ tests/
+    python python_import_sorter.py --check .  # only report files that need sorting
+
+Like isort, imports are grouped into `__future__`, standard library, third-party and
+first-party sections separated by blank lines. First-party modules are the top-level
+packages/modules of the current directory (and its `src` directory) or given by `--first-party`.
+"""
+
+import argparse
+import ast
+import io
+import os
+import pkgutil
+import re
+import sys
+import threading
+import tokenize
+from bisect import bisect_right
+from collections import OrderedDict
+from functools import lru_cache, partial
+from typing import FrozenSet, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+try:
+    from .batch_processing import EXCLUDED_DIRS, add_jobs_argument, exit_status, iter_files, map_in_processes
+except ImportError:
+    # run as a script
+    from batch_processing import EXCLUDED_DIRS, add_jobs_argument, exit_status, iter_files, map_in_processes
+
+ImportNode = Union[ast.Import, ast.ImportFrom]
+ImportSortKey = Tuple[int, int, str, Tuple[Tuple[str, str], ...]]
+
+# import groups, in the order they are written
+FUTURE_GROUP, STDLIB_GROUP, THIRD_PARTY_GROUP, FIRST_PARTY_GROUP = range(4)
+
+SECTION_CACHE_SIZE = 256
+_section_cache: 'OrderedDict[Tuple[str, int, Optional[FrozenSet[str]]], str]' = OrderedDict()
+# sections may be sorted from several threads at once (e.g. by the editor's thread pool)
+_section_cache_lock = threading.Lock()
+
+
+def sort_imports(
+    source: str,
+    tab_size: int = 4,
+    strict: bool = True,
+    first_party: Optional[FrozenSet[str]] = None,
+    remove_unused: bool = False,
+) -> str:
+    """
+    Sort all top-level import sections of `source`, which is parsed only once.
+
+    If `source` can not be parsed, `SyntaxError` is raised when `strict` is True, otherwise
+    the import statements are found by a tokenize-based scanner and sorted section by section.
+
+    If `first_party` (top-level names of first-party modules) is given, imports are grouped
+    isort-style, and sections separated only by blank lines are merged before sorting.
+
+    If `remove_unused` is True, top-level imported names which are never referenced
+    in the module are removed (see `remove_unused_imports`). This is not done
+    when `source` can not be parsed. The imports of a package `__init__` are its API,
+    callers check `is_package_init` before asking for it.
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        if strict:
+            raise
+        return sort_import_rows(source, scan_import_rows(source), tab_size, first_party)
+
+    lines = source.split('\n')
+    sections = find_import_sections(tree.body, lines if first_party is not None else None)
+    if not sections:
+        return source
+
+    used_names = collect_used_names(tree) if remove_unused else None
+    is_last_section = True
+    for section in reversed(sections):
+        first_row, end_row = section[0].lineno - 1, section[-1].end_lineno
+        sorted_section_content = None
+        if used_names is not None:
+            num_names = sum(len(node.names) for node in section)
+            assoc_comments = [find_assoc_comment(lines, node) for node in section]
+            nodes, assoc_comments = remove_unused_imports(section, assoc_comments, used_names)
+            if not nodes:
+                remove_rows(lines, first_row, end_row)
+                continue
+            if sum(len(node.names) for node in nodes) < num_names:
+                nodes, assoc_comments = sort_import_nodes(nodes, assoc_comments, first_party)
+                sorted_section_content = unparse_imports(nodes, assoc_comments, tab_size, first_party)
+
+        if sorted_section_content is None:
+            # sections which did not change since the last time (e.g. the last save) are not sorted again
+            sorted_section_content = sort_import_section_cached('\n'.join(lines[first_row:end_row]), tab_size, first_party)
+        sorted_lines = sorted_section_content.split('\n')
+        lines[first_row:end_row] = sorted_lines
+        if is_last_section:
+            # spaces between imports and the rest must be at least 2 (except for __all__ magic variable),
+            # fixed after the sections below were removed (if unused) and before the rows above move
+            fix_spacing_after_imports(lines, first_row + len(sorted_lines))
+            is_last_section = False
+    return '\n'.join(lines)
+
+def sort_import_section(section_content: str, tab_size: int = 4, first_party: Optional[FrozenSet[str]] = None) -> str:
+    """Sort a section which contains only import statements."""
+    tree = ast.parse(section_content)
+    for node in tree.body:
+        if not isinstance(node, (ast.Import, ast.ImportFrom)):
+            raise ValueError(f'Expected node to be an import or import from statement, got: {ast.dump(node)}')
+
+    lines = section_content.split('\n')
+    assoc_comments = [find_assoc_comment(lines, node) for node in tree.body]
+    nodes, assoc_comments = sort_import_nodes(tree.body, assoc_comments, first_party)
+    return unparse_imports(nodes, assoc_comments, tab_size, first_party)
+
+def sort_import_rows(
+    source: str,
+    rows: Sequence[Tuple[int, int]],
+    tab_size: int = 4,
+    first_party: Optional[FrozenSet[str]] = None,
+) -> str:
+    """
+    Sort import sections of `source` given the (first, last) 0-based rows of its import statements,
+    e.g. found from the syntax scopes of an editor. Sections which can not be parsed are left as they are.
+    """
+    lines = source.split('\n')
+    sections: List[List[int]] = []
+    for first_row, last_row in sorted(rows):
+        # only top-level imports are sorted
+        if lines[first_row][:1] in (' ', '\t'):
+            continue
+        if sections and (
+            first_row <= sections[-1][1] + 1 or
+            (first_party is not None and is_blank(lines[sections[-1][1] + 1:first_row]))
+        ):
+            sections[-1][1] = max(sections[-1][1], last_row)
+        else:
+            sections.append([first_row, last_row])
+    if not sections:
+        return source
+
+    # spaces between imports and the rest must be at least 2 (except for __all__ magic variable)
+    fix_spacing_after_imports(lines, sections[-1][1] + 1)
+
+    for first_row, last_row in reversed(sections):
+        # TODO: assume that section content contains only import statements
+        try:
+            sorted_section_content = sort_import_section_cached(
+                '\n'.join(lines[first_row:last_row + 1]),
+                tab_size,
+                first_party,
+            )
+        except (SyntaxError, ValueError) as e:
+            print(f'Failed to parse import section: {e}')
+            continue
+        lines[first_row:last_row + 1] = sorted_section_content.split('\n')
+    return '\n'.join(lines)
+
+def scan_import_rows(source: str) -> List[Tuple[int, int]]:
+    """
+    Find the (first, last) 0-based rows of top-level import statements with `tokenize`,
+    for sources which can not be parsed. Scanning stops at the first tokenize error.
+    """
+    rows: List[Tuple[int, int]] = []
+    first_token: Optional[tokenize.TokenInfo] = None
+    has_semicolon = False
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(source).readline):
+            if token.type in (tokenize.NL, tokenize.COMMENT, tokenize.INDENT, tokenize.DEDENT):
+                continue
+            if token.type in (tokenize.NEWLINE, tokenize.ENDMARKER):
+                if (
+                    first_token is not None and
+                    first_token.start[1] == 0 and
+                    first_token.string in ('import', 'from') and
+                    not has_semicolon
+                ):
+                    rows.append((first_token.start[0] - 1, token.start[0] - 1))
+                first_token = None
+                has_semicolon = False
+            elif first_token is None:
+                first_token = token
+            elif token.string == ';':
+                has_semicolon = True
+    except (tokenize.TokenError, SyntaxError):
+        pass
+    return rows
+
+def offsets_to_rows(source: str, spans: Sequence[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Convert (begin, end) character offsets of `source` to (first, last) 0-based rows."""
+    line_starts = [0]
+    line_starts.extend(match.end() for match in re.finditer('\n', source))
+    rows = []
+    for begin, end in spans:
+        # a span may end right after the newline of its last line
+        last = max(begin, end - 1)
+        rows.append((bisect_right(line_starts, begin) - 1, bisect_right(line_starts, last) - 1))
+    return rows
+
+def diff_span(old: str, new: str) -> Tuple[int, int, str]:
+    """
+    Find the smallest edit turning `old` into `new`.
+
+    Returns (begin, end, replacement), meaning `old[begin:end]` should be replaced by `replacement`.
+    """
+    prefix_length = _common_prefix_length(old, new)
+    max_suffix_length = min(len(old), len(new)) - prefix_length
+    suffix_length = _common_prefix_length(old[::-1][:max_suffix_length], new[::-1][:max_suffix_length])
+    return prefix_length, len(old) - suffix_length, new[prefix_length:len(new) - suffix_length]
+
+def _common_prefix_length(lhs: str, rhs: str) -> int:
+    # binary search, so that the comparisons are done on slices instead of char by char
+    low, high = 0, min(len(lhs), len(rhs))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if lhs[:mid] == rhs[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+def sort_import_section_cached(
+    section_content: str,
+    tab_size: int = 4,
+    first_party: Optional[FrozenSet[str]] = None,
+) -> str:
+    """
+    Same as `sort_import_section`, but the result is kept in a small LRU cache keyed by
+    the section content, so that sections which did not change are not parsed again.
+    """
+    key = (section_content, tab_size, first_party)
+    with _section_cache_lock:
+        sorted_section_content = _section_cache.get(key)
+        if sorted_section_content is not None:
+            _section_cache.move_to_end(key)
+            return sorted_section_content
+
+    # sorted outside of the lock, two threads may sort the same section but will get the same result
+    sorted_section_content = sort_import_section(section_content, tab_size, first_party)
+    with _section_cache_lock:
+        _section_cache[key] = sorted_section_content
+        # sorting is idempotent, so an already sorted section maps to itself
+        _section_cache[(sorted_section_content, tab_size, first_party)] = sorted_section_content
+        while len(_section_cache) > SECTION_CACHE_SIZE:
+            _section_cache.popitem(last=False)
+    return sorted_section_content
+
+def find_import_sections(body: Sequence[ast.stmt], lines: Optional[List[str]] = None) -> List[List[ImportNode]]:
+    """
+    Group top-level import statements on consecutive lines into sections. If the source `lines`
+    are given, statements separated only by blank lines are put into the same section.
+    """
+    sections: List[List[ImportNode]] = []
+    prev_node: Optional[ImportNode] = None
+    for idx, node in enumerate(body):
+        # statements sharing a line with another statement (e.g. `import os; x = 1`) are left untouched
+        shares_line = (
+            (idx > 0 and body[idx - 1].end_lineno == node.lineno) or
+            (idx + 1 < len(body) and body[idx + 1].lineno == node.end_lineno)
+        )
+        if not isinstance(node, (ast.Import, ast.ImportFrom)) or shares_line:
+            prev_node = None
+            continue
+
+        if prev_node is not None and (
+            node.lineno == prev_node.end_lineno + 1 or
+            (lines is not None and is_blank(lines[prev_node.end_lineno:node.lineno - 1]))
+        ):
+            sections[-1].append(node)
+        else:
+            sections.append([node])
+        prev_node = node
+    return sections
+
+def remove_rows(lines: List[str], first_row: int, end_row: int) -> None:
+    """Remove the rows `first_row` to `end_row` (excluded) and the blank lines following them."""
+    while end_row < len(lines) and lines[end_row].strip() == '':
+        end_row += 1
+    if end_row == len(lines):
+        # nothing follows, the blank lines before are dropped as well but the final newline is kept
+        while first_row > 0 and lines[first_row - 1].strip() == '':
+            first_row -= 1
+        lines[first_row:] = [''] if first_row > 0 else []
+        return
+    lines[first_row:end_row] = []
+
+def is_blank(lines: Sequence[str]) -> bool:
+    return all(line.strip() == '' for line in lines)
+
+def find_assoc_comment(lines: List[str], node: ImportNode) -> Optional[str]:
+    """Find the inline comment associated with `node`, `lines` are the lines of the parsed source."""
+    for line in reversed(lines[node.lineno - 1:node.end_lineno]):
+        comment_symb_idx = line.find('#')
+        if comment_symb_idx != -1:
+            return line[comment_symb_idx:].rstrip()
+    return None
+
+def fix_spacing_after_imports(lines: List[str], end: int) -> None:
+    """Make sure there are exactly two blank lines between the imports ending at row `end` and the rest."""
+    if end >= len(lines):
+        return
+
+    next_row = end
+    while next_row < len(lines) and lines[next_row].strip() == '':
+        next_row += 1
+    if next_row == len(lines):
+        # nothing follows the imports, just keep the final newline
+        lines[end:] = ['']
+        return
+
+    num_blank_lines = 1 if starts_with_magic_var(lines[next_row]) else 2
+    lines[end:next_row] = [''] * num_blank_lines
+
+def starts_with_magic_var(line: str) -> bool:
+    magic_vars = [
+        '__all__',
+    ]
+    for magic_var in magic_vars:
+        if line.startswith(magic_var):
+            return True
+    return False
+
+def collect_used_names(tree: ast.Module) -> Set[str]:
+    """
+    Collect all names referenced in a module with a single walk over its AST, including
+    forward references (strings anywhere inside annotations, the type of `cast`, the bound
+    and constraints of `TypeVar`) and names listed in `__all__`.
+
+    Only string literals in lists and tuples assigned to or added to `__all__` (with `=`, `+=`,
+    `+`, `.extend()` and `.append()`) are known to be exported, e.g. the names of
+    `__all__ += other.__all__` are not.
+    """
+    used_names: Set[str] = set()
+    # subtrees whose strings are forward references
+    type_expressions: List[ast.AST] = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            used_names.add(node.id)
+            continue
+
+        if isinstance(node, (ast.arg, ast.AnnAssign)) and node.annotation is not None:
+            type_expressions.append(node.annotation)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.returns is not None:
+            type_expressions.append(node.returns)
+        elif isinstance(node, ast.Call):
+            func_name = call_name(node)
+            if func_name == 'cast' and node.args:
+                type_expressions.append(node.args[0])
+            elif func_name == 'TypeVar':
+                type_expressions.extend(node.args[1:])
+                type_expressions.extend(keyword.value for keyword in node.keywords if keyword.arg == 'bound')
+            elif (
+                func_name in ('extend', 'append') and
+                isinstance(node.func, ast.Attribute) and
+                isinstance(node.func.value, ast.Name) and
+                node.func.value.id == '__all__'
+            ):
+                used_names.update(exported_names(node.args))
+
+        # names exported by `__all__ = [...]` / `__all__ += [...]`
+        if isinstance(node, ast.Assign):
+            targets = node.targets
+        elif isinstance(node, (ast.AugAssign, ast.AnnAssign)):
+            targets = [node.target]
+        else:
+            continue
+        if node.value is not None and any(isinstance(target, ast.Name) and target.id == '__all__' for target in targets):
+            used_names.update(exported_names([node.value]))
+
+    for type_expression in type_expressions:
+        used_names.update(forward_reference_names(type_expression))
+    return used_names
+
+def call_name(node: ast.Call) -> Optional[str]:
+    """Name of the called function, e.g. `cast` for both `cast(...)` and `typing.cast(...)`."""
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+def forward_reference_names(type_expression: ast.AST) -> Set[str]:
+    """Names in the strings of a type expression, e.g. `Foo` and `Bar` in `Optional['Dict[Foo, "Bar"]']`."""
+    names: Set[str] = set()
+    for node in ast.walk(type_expression):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            try:
+                string_tree = ast.parse(node.value.strip(), mode='eval')
+            except SyntaxError:
+                # e.g. `Literal['some text']`
+                continue
+            names.update(child.id for child in ast.walk(string_tree) if isinstance(child, ast.Name))
+            # strings nested in the string
+            names.update(forward_reference_names(string_tree))
+    return names
+
+def exported_names(values: Sequence[ast.expr]) -> Set[str]:
+    """String literals of the lists and tuples in `values` (e.g. of `['a'] + ['b']`), or the strings themselves."""
+    names: Set[str] = set()
+    for value in values:
+        if isinstance(value, ast.Constant) and isinstance(value.value, str):
+            # `__all__.append('name')`
+            names.add(value.value)
+            continue
+        for node in ast.walk(value):
+            if isinstance(node, (ast.List, ast.Tuple)):
+                names.update(
+                    element.value for element in node.elts
+                    if isinstance(element, ast.Constant) and isinstance(element.value, str)
+                )
+    return names
+
+def is_package_init(file_path: Optional[str]) -> bool:
+    """Whether `file_path` is the `__init__` of a package, whose imports are re-exported even if unused."""
+    return file_path is not None and os.path.basename(file_path) in ('__init__.py', '__init__.pyi')
+
+def remove_unused_imports(
+    nodes: Sequence[ImportNode],
+    assoc_comments: Sequence[Optional[str]],
+    used_names: Set[str],
+) -> Tuple[List[ImportNode], List[Optional[str]]]:
+    """
+    Remove imported names which are not in `used_names`, statements importing no name
+    anymore are dropped. `__future__` imports, star imports, explicit re-exports
+    (`import x as x`) and statements with a `# noqa` comment are kept.
+    """
+    new_nodes: List[ImportNode] = []
+    new_assoc_comments: List[Optional[str]] = []
+    for node, assoc_comment in zip(nodes, assoc_comments):
+        if (
+            (isinstance(node, ast.ImportFrom) and node.module == '__future__') or
+            (assoc_comment is not None and 'noqa' in assoc_comment)
+        ):
+            new_nodes.append(node)
+            new_assoc_comments.append(assoc_comment)
+            continue
+
+        names = []
+        for alias in node.names:
+            if isinstance(node, ast.Import):
+                bound_name = alias.asname or alias.name.partition('.')[0]
+            else:
+                bound_name = alias.asname or alias.name
+            if alias.name == '*' or alias.name == alias.asname or bound_name in used_names:
+                names.append(alias)
+        if names:
+            node.names = names
+            new_nodes.append(node)
+            new_assoc_comments.append(assoc_comment)
+    return new_nodes, new_assoc_comments
+
+def sort_import_nodes(
+    nodes: Sequence[ImportNode],
+    assoc_comments: Sequence[Optional[str]],
+    first_party: Optional[FrozenSet[str]] = None,
+) -> Tuple[List[ImportNode], List[Optional[str]]]:
+    """Sort import statements (and the names they import), and remove duplicates."""
+    for node in nodes:
+        node.names = sorted(node.names, key=lambda alias: (alias.name, alias.asname or ''))
+
+    keys = [import_sort_key(node, first_party) for node in nodes]
+    new_nodes: List[ImportNode] = []
+    new_assoc_comments: List[Optional[str]] = []
+    prev_key: Optional[ImportSortKey] = None
+    for idx in sorted(range(len(nodes)), key=keys.__getitem__):
+        # equal keys mean identical statements, keep the first one
+        if keys[idx] == prev_key:
+            continue
+        new_nodes.append(nodes[idx])
+        new_assoc_comments.append(assoc_comments[idx])
+        prev_key = keys[idx]
+    return new_nodes, new_assoc_comments
+
+def unparse_imports(
+    nodes: Sequence[ImportNode],
+    assoc_comments: Sequence[Optional[str]],
+    tab_size: int = 4,
+    first_party: Optional[FrozenSet[str]] = None,
+) -> str:
+    source = []
+    tabs = " " * tab_size
+
+    wrap_limits = [
+        {'num_aliases': 2, 'limit': 76},
+        {'num_aliases': 3, 'limit': 72},
+        {'num_aliases': 4, 'limit': 64},
+        {'num_aliases': 5, 'limit': 56},
+        {'num_aliases': 6, 'limit': 44},
+        {'num_aliases': 7, 'limit': -1},
+    ]
+    assert len(nodes) == len(assoc_comments)
+    prev_group: Optional[int] = None
+    for idx, node in enumerate(nodes):
+        if first_party is not None:
+            # groups are separated by a blank line
+            group = import_group(node, first_party)
+            if prev_group is not None and group != prev_group:
+                source.append('')
+            prev_group = group
+
+        if isinstance(node, ast.Import):
+            prefix = 'import '
+        elif isinstance(node, ast.ImportFrom):
+            prefix = f'from {module_name(node)} import '
+        else:
+            raise ValueError(f'Expected node to be an import or import from statement, got: {ast.dump(node)}')
+        aliases = []
+        for alias in node.names:
+            if alias.asname:
+                aliases.append(f'{alias.name} as {alias.asname}')
+            else:
+                aliases.append(alias.name)
+
+        all_aliases = ', '.join(aliases)
+        total_length = len(all_aliases) + len(prefix)
+        will_wrap = False
+        for wrap_limit in wrap_limits:
+            if len(node.names) >= wrap_limit['num_aliases'] and total_length > wrap_limit['limit']:
+                will_wrap = True
+                break
+        if will_wrap:
+            prefix += f'(\n{tabs}'
+            all_aliases = all_aliases.replace(', ', f',\n{tabs}')
+            all_aliases += ',\n)'
+        assoc_comment = assoc_comments[idx]
+        if assoc_comment is not None:
+            all_aliases += '  ' + assoc_comment
+        source.append(prefix + all_aliases)
+    return '\n'.join(source)
+
+def module_name(node: ast.ImportFrom) -> str:
+    """Module name of an import from statement, including leading dots of relative imports."""
+    return '.' * node.level + (node.module or '')
+
+def import_sort_key(node: ImportNode, first_party: Optional[FrozenSet[str]] = None) -> ImportSortKey:
+    """
+    Sort key of an import statement: `from __future__ import ...` first, then `import ...`
+    and then `from ... import ...`, each ordered by module and imported names.
+    If `first_party` is given, statements are ordered by their import group first.
+
+    Two statements have the same key if and only if they are identical.
+    """
+    group = import_group(node, first_party) if first_party is not None else 0
+    names = tuple((alias.name, alias.asname or '') for alias in node.names)
+    if isinstance(node, ast.Import):
+        return group, 1, '', names
+    elif isinstance(node, ast.ImportFrom):
+        # `from __future__ import ...` must stay at the beginning of the file
+        kind = 0 if node.module == '__future__' else 2
+        return group, kind, module_name(node), names
+    raise ValueError(f'Expected node to be an import or import from statement, got: {ast.dump(node)}')
+
+def import_group(node: ImportNode, first_party: FrozenSet[str]) -> int:
+    """Import group of a statement, relative imports belong to the first-party group."""
+    if isinstance(node, ast.ImportFrom):
+        if node.level > 0:
+            return FIRST_PARTY_GROUP
+        if node.module == '__future__':
+            return FUTURE_GROUP
+        top_level_name = (node.module or '').partition('.')[0]
+    else:
+        top_level_name = node.names[0].name.partition('.')[0]
+
+    if top_level_name in first_party:
+        return FIRST_PARTY_GROUP
+    if top_level_name in stdlib_module_names():
+        return STDLIB_GROUP
+    return THIRD_PARTY_GROUP
+
+@lru_cache(maxsize=None)
+def stdlib_module_names() -> FrozenSet[str]:
+    """Top-level module names of the standard library, loaded once per interpreter."""
+    names = getattr(sys, 'stdlib_module_names', None)
+    if names is None:
+        # python < 3.10 (e.g. the 3.8 plugin host), list the modules of the stdlib directory instead
+        stdlib_dir = os.path.dirname(os.__file__)
+        names = set(sys.builtin_module_names)
+        names.update(module.name for module in pkgutil.iter_modules([stdlib_dir, os.path.join(stdlib_dir, 'lib-dynload')]))
+    return frozenset(names)
+
+def find_first_party_modules(folders: Sequence[str]) -> FrozenSet[str]:
+    """Top-level packages and modules which can be imported from `folders` (or their `src` directories)."""
+    names = set()
+    for folder in folders:
+        if os.path.isfile(os.path.join(folder, '__init__.py')):
+            # the folder is a package itself
+            names.add(os.path.basename(os.path.normpath(folder)))
+
+        for directory in (folder, os.path.join(folder, 'src')):
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.name.startswith('.') or entry.name in EXCLUDED_DIRS:
+                            continue
+                        if entry.is_dir():
+                            if entry.name.isidentifier() and os.path.isfile(os.path.join(entry.path, '__init__.py')):
+                                names.add(entry.name)
+                        elif entry.name.endswith('.py') and entry.name[:-3].isidentifier():
+                            names.add(entry.name[:-3])
+            except OSError:
+                continue
+    return frozenset(names)
+
+def sort_file(
+    file_path: str,
+    check: bool = False,
+    tab_size: int = 4,
+    first_party: Optional[FrozenSet[str]] = None,
+    remove_unused: bool = False,
+) -> bool:
+    """
+    Sort imports of a python file in place (unless `check` is True).
+    Unused imports are never removed from a package `__init__`.
+
+    Returns whether the file content is (or would be) changed.
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read()
+
+    # keep the encoding and line endings of the file as they are
+    encoding, _ = tokenize.detect_encoding(io.BytesIO(data).readline)
+    source = data.decode(encoding)
+    newline = '\r\n' if '\r\n' in source else '\n'
+    new_source = sort_imports(
+        source.replace('\r\n', '\n'),
+        tab_size,
+        first_party=first_party,
+        remove_unused=remove_unused and not is_package_init(file_path),
+    ).replace('\n', newline)
+    if new_source == source:
+        return False
+
+    if not check:
+        with open(file_path, 'wb') as f:
+            f.write(new_source.encode(encoding))
+    return True
+
+def iter_python_files(paths: Sequence[str]) -> Iterator[str]:
+    return iter_files(paths, ('.py', '.pyi'))
+
+def _sort_file_worker(
+    file_path: str,
+    check: bool,
+    first_party: Optional[FrozenSet[str]],
+    remove_unused: bool,
+) -> Tuple[str, bool, Optional[str]]:
+    try:
+        return file_path, sort_file(file_path, check, first_party=first_party, remove_unused=remove_unused), None
+    except (SyntaxError, ValueError, UnicodeDecodeError, OSError) as e:
+        return file_path, False, str(e)
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Sort import statements of python files.')
+    parser.add_argument('paths', nargs='+', help='python files or directories to sort recursively')
+    parser.add_argument('--check', action='store_true', help='only report files whose imports are not sorted')
+    add_jobs_argument(parser)
+    parser.add_argument(
+        '--first-party',
+        action='append',
+        default=[],
+        metavar='NAME',
+        help='top-level name of a first-party module, can be given multiple times',
+    )
+    parser.add_argument('--no-sections', action='store_true', help='do not group imports into sections')
+    parser.add_argument('--remove-unused', action='store_true', help='remove imported names which are never used (except in package __init__ files)')
+    args = parser.parse_args(argv)
+
+    first_party = None
+    if not args.no_sections:
+        first_party = find_first_party_modules([os.getcwd()]) | frozenset(args.first_party)
+
+    worker = partial(_sort_file_worker, check=args.check, first_party=first_party, remove_unused=args.remove_unused)
+    results = map_in_processes(worker, args.jobs, iter_python_files(args.paths))
+
+    num_changed = 0
+    num_errors = 0
+    for file_path, changed, error in results:
+        if error is not None:
+            num_errors += 1
+            print(f'error: {file_path}: {error}', file=sys.stderr)
+        elif changed:
+            num_changed += 1
+            print(f'{"Would sort" if args.check else "Sorted"} imports in {file_path}')
+
+    return exit_status(args.check, num_changed, num_errors, 'would be changed')
+
+if __name__ == '__main__':
+    sys.exit(main())
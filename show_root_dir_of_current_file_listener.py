@@ -4,7 +4,64 @@ import sublime
 import sublime_plugin
 
 import os
+from typing import Dict, Optional, Tuple
 
+# number of labels cached per window, the cache is cleared when it is full
+LABEL_CACHE_SIZE = 4096
+
+
+class FolderIndex:
+    """
+    Folders of each window by path, rebuilt when the folders change, so that finding the folder
+    of a file is a dict lookup per parent directory of the file instead of a scan of the folders.
+    The label of each file is cached as well.
+    """
+
+    def __init__(self) -> None:
+        # window id -> (folders, folder path -> label start, file name -> label)
+        self._index: Dict[int, Tuple[Tuple[str, ...], Dict[str, int], Dict[str, Optional[str]]]] = {}
+
+    def get_label(self, window: sublime.Window, file_name: str) -> Optional[str]:
+        folders = tuple(window.folders())
+        entry = self._index.get(window.id())
+        if entry is None or entry[0] != folders:
+            entry = self._build(window.id(), folders)
+        _, label_starts, labels = entry
+
+        if file_name in labels:
+            return labels[file_name]
+        if len(labels) >= LABEL_CACHE_SIZE:
+            labels.clear()
+        label = labels[file_name] = find_label(file_name, label_starts)
+        return label
+
+    def discard(self, window: sublime.Window) -> None:
+        self._index.pop(window.id(), None)
+
+    def _build(self, window_id: int, folders: Tuple[str, ...]):
+        label_starts: Dict[str, int] = {}
+        for folder in folders:
+            folder = os.path.normpath(folder)
+            # the label starts with the folder name
+            label_starts.setdefault(folder, len(folder) - len(os.path.basename(folder)))
+        entry = (folders, label_starts, {})
+        self._index[window_id] = entry
+        return entry
+
+folder_index = FolderIndex()
+
+def find_label(file_name: str, label_starts: Dict[str, int]) -> Optional[str]:
+    """Path of a file from its innermost folder, e.g. `proj/src/main.py`, None if it is not in a folder."""
+    # going up one path component at a time, so that /proj-old/file is not found in /proj
+    dir_path = os.path.dirname(file_name)
+    while True:
+        label_start = label_starts.get(dir_path)
+        if label_start is not None:
+            return file_name[label_start:]
+        parent_path = os.path.dirname(dir_path)
+        if parent_path == dir_path:
+            return None
+        dir_path = parent_path
 
 def show_file_path(view: sublime.View):
     window = view.window()
@@ -16,13 +73,9 @@ def show_file_path(view: sublime.View):
         # file is unsaved
         return
 
-    opened_dirs = window.folders()
-    for opened_dir in opened_dirs:
-        if file_name.startswith(opened_dir):
-            opened_dir_basename = os.path.basename(opened_dir)
-            clipped_file_name = file_name[len(opened_dir) - len(opened_dir_basename):]
-            view.set_status('_file_path', '[' + clipped_file_name + ']')
-            break
+    label = folder_index.get_label(window, file_name)
+    if label is not None:
+        view.set_status('_file_path', '[' + label + ']')
     else:
         view.erase_status('_file_path')
 
@@ -30,3 +83,6 @@ class ShowFilePathOnStatusBarListener(sublime_plugin.EventListener):
     def on_activated(self, view: sublime.View):
         """Called when a view gains input focus."""
         show_file_path(view)
+
+    def on_pre_close_window(self, window: sublime.Window):
+        folder_index.discard(window)
@@ -1,196 +1,348 @@
-"""A simple plugin for sorting python import statements."""
+"""
+A simple plugin for sorting python import statements.
 
-import ast
-from functools import cmp_to_key
-from typing import List, Optional, Tuple
+To sort imports every time a python file is saved, add this to your
+Python.sublime-settings (Preferences > Settings - Syntax Specific):
+    "sort_python_imports_on_save": true,
+
+By default, import statements are found from syntax scopes. Set
+`"sort_python_imports_mode": "ast"` to parse the whole file once instead, this
+also works with python syntaxes which do not scope import statements.
+
+Imports are grouped into `__future__`, standard library, third-party and first-party
+sections, first-party modules are the top-level packages/modules of the window's folders.
+They are indexed in the background, imports are not sorted (not even on save) until the
+index of the current folders is ready, so that the sections never depend on timing.
+Set `"sort_python_imports_group_sections": false` to keep a single sorted list. The settings
+are read from the view, except for the files which are not open when sorting a whole project
+(see `SortPythonImportsInAllFilesCommand`).
+
+With `"remove_unused": true` (or the `sort_python_imports_remove_unused` setting for
+sort-on-save), top-level imports which are never used in the module are removed,
+this always parses the whole file. Package `__init__` files are only sorted, their
+imports are the package's API.
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, FrozenSet, List, Literal, Optional, Set, Tuple, Union
 
 import sublime
 import sublime_plugin
 
+from .batch_processing import new_thread_pool
+from .python_import_sorter import (
+    diff_span,
+    find_first_party_modules,
+    is_package_init,
+    iter_python_files,
+    offsets_to_rows,
+    sort_file,
+    sort_import_rows,
+    sort_imports,
+)
+
+NOT_READY_MESSAGE = 'Imports not sorted: the first-party modules are still being indexed'
+
+_executor: Optional[ThreadPoolExecutor] = None
+
 
 class SortPythonImportsCommand(sublime_plugin.TextCommand):
-    def is_enabled(self) -> bool:
-        settings = self.view.settings()
-        python_syntaxes = [
-            'Packages/Python/Python.sublime-syntax',
-            'Packages/User/Python-custom.sublime-syntax',
+    def is_enabled(self, mode: Literal['scope', 'ast'] = 'scope', remove_unused: bool = False) -> bool:
+        if self.view.match_selector(0, 'source.python'):
+            return True
+
+        # the whole-file mode does not rely on syntax scopes, so any python file will do
+        file_name = self.view.file_name()
+        return (mode == 'ast' or remove_unused) and file_name is not None and file_name.endswith(('.py', '.pyi'))
+
+    def run(self, edit: sublime.Edit, mode: Literal['scope', 'ast'] = 'scope', remove_unused: bool = False):
+        # the new content is built in memory and applied with a single replace,
+        # so the number of buffer api calls does not depend on the number of imports
+        content = self.view.substr(sublime.Region(0, self.view.size()))
+        first_party = None
+        if group_sections(self.view.settings()):
+            first_party = first_party_index.get(self.view.window())
+            if first_party is None:
+                # grouping without the index would put first-party imports into the third-party
+                # section, and the next sort (e.g. the next save) would move them back
+                sublime.status_message(NOT_READY_MESSAGE)
+                return
+
+        if mode == 'ast' or remove_unused:
+            # parse the whole file once, fall back to a tokenize-based scanner on syntax errors
+            remove_unused = remove_unused and not is_package_init(self.view.file_name())
+            new_content = sort_imports(content, strict=False, first_party=first_party, remove_unused=remove_unused)
+        else:
+            regions = self.view.find_by_selector('meta.statement.import')
+            if not regions:
+                return
+            rows = offsets_to_rows(content, [(region.begin(), region.end()) for region in regions])
+            new_content = sort_import_rows(content, rows, first_party=first_party)
+        replace_minimal(self.view, edit, content, new_content)
+
+class SortPythonImportsInAllFilesCommand(sublime_plugin.WindowCommand):
+    """
+    Sort imports of every python view open in the window (`target` is "views"),
+    or of every python file in the window's folders (`target` is "project").
+
+    Files are read, parsed and sorted on a thread pool, only the final replacements
+    of open views are done on the main thread.
+
+    Open views are sorted with their own settings, like `SortPythonImportsCommand` does.
+    The other files of the project are sorted with the settings of the project file, then
+    Python.sublime-settings, then Preferences.sublime-settings.
+    """
+
+    def run(self, target: Literal['views', 'project'] = 'views'):
+        # buffers are read here, on the main thread
+        views = [view for view in self.window.views() if is_python_view(view)]
+        view_contents = [
+            (view, view.change_count(), view.substr(sublime.Region(0, view.size())), group_sections(view.settings()))
+            for view in views
         ]
-        return settings.get('syntax') in python_syntaxes
+        open_files = {view.file_name() for view in views if view.file_name() is not None}
 
-    def run(self, edit: sublime.Edit): 
-        regions = self.view.find_by_selector('meta.statement.import')
-        if not regions:
-            return
+        project_group_sections = target == 'project' and group_sections(ProjectSettings(self.window))
+        first_party = None
+        if project_group_sections or any(view_group_sections for *_, view_group_sections in view_contents):
+            first_party = first_party_index.get(self.window)
+            if first_party is None:
+                self.window.status_message(NOT_READY_MESSAGE)
+                return
 
-        # import statements can have inline comment associated with them,
-        # so we need to expand the region to cover that comment
-        regions = [self.view.line(region) for region in regions]
-
-        assoc_comments: List[Optional[str]] = [None for _ in range(len(regions))]
-        for idx, region in enumerate(regions):
-            current_line = self.view.substr(self.view.line(region))
-            comment_symb_idx = current_line.rfind('#')
-            if comment_symb_idx != -1:
-                assoc_comments[idx] = current_line[comment_symb_idx:]
-
-        # insert two lines after import statements
-        last_import_row = self.view.rowcol(regions[-1].end())[0]
-        cur_row = last_import_row + 1
-        view_num_rows = self.view.rowcol(self.view.size())[0]
-
-        # find the first non-empty line
-        while (cur_row < view_num_rows):
-            is_empty_line = self.line_content(cur_row).strip() == ''
-            if not is_empty_line:
-                break
-            cur_row += 1
-
-        # spaces between imports and the rest must be at least 2 (except for __all__ magic variable)
-        # add extra lines if necessary
-        while cur_row - last_import_row <= 2:
-            if (
-                self.starts_with_magic_var(self.line_content(cur_row)) and
-                cur_row - last_import_row == 2
-            ):
-                break
-            self.view.insert(edit, self.view.text_point(cur_row, 0), '\n')
-            cur_row += 1
-
-        # remove redundant lines
-        num_lines_to_remove = cur_row - last_import_row - 3
-        if self.starts_with_magic_var(self.line_content(cur_row)):
-            num_lines_to_remove += 1
-        for _ in range(0, num_lines_to_remove):
-            cur_row -= 1
-            assert self.line_content(cur_row).strip() == ''
-            self.view.erase(edit, self.view.full_line(self.view.text_point(cur_row, 0)))
-
-        import_section_regions: List[List[Tuple[sublime.Region, Optional[str]]]] = []
-        for idx in range(len(regions)):
-            region = regions[idx]
-            if idx == 0 or self.view.rowcol(region.begin())[0] > self.view.rowcol(regions[idx - 1].end())[0] + 1:
-                import_section_regions.append([(region, assoc_comments[idx])])
-            else:
-                import_section_regions[-1].append((region, assoc_comments[idx]))
-
-        for import_section_region in reversed(import_section_regions):
-            section_content = self.view.substr(sublime.Region(
-                import_section_region[0][0].begin(),
-                import_section_region[-1][0].end()),
+        progress = _Progress(self.window, len(view_contents))
+        for view, change_count, content, view_group_sections in view_contents:
+            future = get_executor().submit(
+                sort_imports,
+                content,
+                strict=False,
+                first_party=first_party if view_group_sections else None,
             )
-            section_assoc_comments = [assoc_comment for _, assoc_comment in import_section_region]
-
-            # TODO: assume that section_content contains only import statements
-            try:
-                tree = ast.parse(section_content)
-            except (SyntaxError, Exception) as e:
-                print(f'Failed to parse import section: {e}')
-
-            for node in tree.body:
-                if not isinstance(node, (ast.Import, ast.ImportFrom)):
-                    raise ValueError(f'Expected node to be an import or import from statement, got: {ast.dump(node)}')
-                node.names = sorted(node.names, key=lambda alias: alias.name)
-
-            # sort import statements
-            tree.body, section_assoc_comments = zip(*sorted(zip(tree.body, section_assoc_comments), key=cmp_to_key(node_cmp)))
-
-            # remove duplicates
-            new_body = []
-            new_section_assoc_comments = []
-            for idx in range(len(tree.body)):
-                if idx == 0 or ast.dump(tree.body[idx]) != ast.dump(tree.body[idx - 1]):
-                    new_body.append(tree.body[idx])
-                    new_section_assoc_comments.append(section_assoc_comments[idx])
-            tree.body = new_body
-            section_assoc_comments = new_section_assoc_comments
-
-            sorted_section_content = unparse_imports(tree, section_assoc_comments)
-            self.view.replace(
-                edit,
-                sublime.Region(import_section_region[0][0].begin(), import_section_region[-1][0].end()),
-                sorted_section_content,
+            future.add_done_callback(
+                lambda future, view=view, change_count=change_count, content=content: self.on_view_sorted(
+                    future, view, change_count, content, progress,
+                ),
             )
 
-    def line_content(self, row: int, full_line: bool = False) -> str:
-        if full_line:
-            line = self.view.full_line(self.view.text_point(row, 0))
+        if target == 'project':
+            folders = self.window.folders()
+            project_first_party = first_party if project_group_sections else None
+            get_executor().submit(self.sort_project_files, folders, open_files, project_first_party, progress)
         else:
-            line = self.view.line(self.view.text_point(row, 0))
-        return self.view.substr(line)
+            progress.finish_listing()
 
-    def starts_with_magic_var(self, line: str) -> bool:
-        magic_vars = [
-            '__all__',
-        ]
-        for magic_var in magic_vars:
-            if line.startswith(magic_var):
-                return True
-        return False
-
-def unparse_imports(tree: ast.Module, assoc_comments: List[Optional[str]], tab_size: int = 4) -> str:
-    source = []
-    tabs = " " * tab_size
-
-    wrap_limits = [
-        {'num_aliases': 2, 'limit': 76},
-        {'num_aliases': 3, 'limit': 72},
-        {'num_aliases': 4, 'limit': 64},
-        {'num_aliases': 5, 'limit': 56},
-        {'num_aliases': 6, 'limit': 44},
-        {'num_aliases': 7, 'limit': -1},
-    ]
-    assert len(tree.body) == len(assoc_comments)
-    for idx, node in enumerate(tree.body):
-        if isinstance(node, ast.Import):
-            prefix = 'import '
-        elif isinstance(node, ast.ImportFrom):
-            prefix = f'from {node.module} import '
-        else:
-            raise ValueError(f'Expected node to be an import or import from statement, got: {ast.dump(node)}')
-        aliases = []
-        for alias in node.names:
-            if alias.asname:
-                aliases.append(f'{alias.name} as {alias.asname}')
-            else:
-                aliases.append(alias.name)
-
-        all_aliases = ', '.join(aliases)
-        total_length = len(all_aliases) + len(prefix)
-        will_wrap = False
-        for wrap_limit in wrap_limits:
-            if len(node.names) >= wrap_limit['num_aliases'] and total_length > wrap_limit['limit']:
-                will_wrap = True
-                break
-        if will_wrap:
-            prefix += f'(\n{tabs}'
-            all_aliases = all_aliases.replace(', ', f',\n{tabs}')
-            all_aliases += ',\n)'
-        if assoc_comments[idx] is not None:
-            all_aliases += '  ' + assoc_comments[idx]
-        source.append(prefix + all_aliases)
-    return '\n'.join(source)
-
-def node_cmp(lhs, rhs) -> int:
-    lhs, rhs = lhs[0], rhs[0]
-    if not isinstance(lhs, (ast.Import, ast.ImportFrom)):
-        raise ValueError(f'Expected lhs to be an import or import from statement, got: {ast.dump(lhs)}')
-    if not isinstance(rhs, (ast.Import, ast.ImportFrom)):
-        raise ValueError(f'Expected lhs to be an import or import from statement, got: {ast.dump(rhs)}')
-
-    if isinstance(lhs, ast.Import) and isinstance(rhs, ast.Import):
-        if lhs.names[0].name < rhs.names[0].name:
-            return -1
-        return 1
-    elif isinstance(lhs, ast.ImportFrom) and isinstance(rhs, ast.ImportFrom):
-        if lhs.module != rhs.module:
-            if lhs.module < rhs.module:
-                return -1
-            return 1
-        else:
-            lhs_names = [alias.name for alias in lhs.names]
-            rhs_names = [alias.name for alias in rhs.names]
-            if lhs_names < rhs_names:
-                return -1
-            return 1
-    else:
-        return -1 if isinstance(lhs, ast.Import) else 1
+    def is_enabled(self, target: Literal['views', 'project'] = 'views') -> bool:
+        if target == 'project':
+            return len(self.window.folders()) > 0
+        return any(is_python_view(view) for view in self.window.views())
+
+    def on_view_sorted(
+        self,
+        future: 'Future[str]',
+        view: sublime.View,
+        change_count: int,
+        content: str,
+        progress: '_Progress',
+    ):
+        try:
+            new_content = future.result()
+        except Exception as e:
+            progress.done(error=f'{view.file_name() or view.name()}: {e}')
+            return
+        if new_content == content:
+            progress.done()
+            return
+
+        def replace():
+            # the view may have been edited while its imports were being sorted
+            if view.is_valid() and view.change_count() == change_count:
+                view.run_command('sort_python_imports_replace_content', {'content': new_content})
+            progress.done()
+
+        sublime.set_timeout(replace)
+
+    def sort_project_files(
+        self,
+        folders: List[str],
+        open_files: Set[str],
+        first_party: Optional[FrozenSet[str]],
+        progress: '_Progress',
+    ):
+        # open files were already sorted in their views
+        file_paths = [file_path for file_path in iter_python_files(folders) if file_path not in open_files]
+        progress.add(len(file_paths))
+        progress.finish_listing()
+        for file_path in file_paths:
+            future = get_executor().submit(sort_file, file_path, first_party=first_party)
+            future.add_done_callback(lambda future, file_path=file_path: self.on_file_sorted(future, file_path, progress))
+
+    def on_file_sorted(self, future: 'Future[bool]', file_path: str, progress: '_Progress'):
+        try:
+            future.result()
+        except Exception as e:
+            progress.done(error=f'{os.path.basename(file_path)}: {e}')
+            return
+        progress.done()
+
+class SortPythonImportsReplaceContentCommand(sublime_plugin.TextCommand):
+    def run(self, edit: sublime.Edit, content: str):
+        old_content = self.view.substr(sublime.Region(0, self.view.size()))
+        replace_minimal(self.view, edit, old_content, content)
+
+class _Progress:
+    """Show progress of a batch on the status bar, can be updated from any thread."""
+
+    def __init__(self, window: sublime.Window, total: int) -> None:
+        self.window = window
+        self.total = total
+        self.num_done = 0
+        self.errors: List[str] = []
+        self.listing = True
+        self.lock = threading.Lock()
+
+    def add(self, count: int) -> None:
+        with self.lock:
+            self.total += count
+
+    def finish_listing(self) -> None:
+        with self.lock:
+            self.listing = False
+        self.done(count=0)
+
+    def done(self, count: int = 1, error: Optional[str] = None) -> None:
+        with self.lock:
+            self.num_done += count
+            if error is not None:
+                self.errors.append(error)
+            finished = not self.listing and self.num_done == self.total
+            message = f'Sorting imports: {self.num_done}/{self.total}'
+            if finished:
+                message = f'Sorted imports in {self.total} file(s)'
+                if self.errors:
+                    message += f', {len(self.errors)} failed (see console)'
+                    for error in self.errors:
+                        print(f'Failed to sort imports: {error}')
+        sublime.set_timeout(lambda: self.window.status_message(message))
+
+class SortPythonImportsOnSaveListener(sublime_plugin.EventListener):
+    def on_pre_save(self, view: sublime.View):
+        # sections which did not change since the last save are served from the cache,
+        # and the command does not make any edit (or undo entry) if nothing changed
+        if view.settings().get('sort_python_imports_on_save', False):
+            view.run_command('sort_python_imports', {
+                'mode': view.settings().get('sort_python_imports_mode', 'scope'),
+                'remove_unused': view.settings().get('sort_python_imports_remove_unused', False),
+            })
+
+class FirstPartyIndex:
+    """
+    First-party module names of each window, built from the window's folders in the background
+    and rebuilt when the folders change, so that classifying an import is only a set lookup.
+    Until the build for the current folders is done, the index is not ready and `get` returns None.
+    """
+
+    def __init__(self) -> None:
+        self._index: Dict[int, Tuple[Tuple[str, ...], FrozenSet[str]]] = {}
+        # window id -> (folders, generation) of the latest build, older builds are dropped
+        self._pending: Dict[int, Tuple[Tuple[str, ...], int]] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, window: Optional[sublime.Window]) -> Optional[FrozenSet[str]]:
+        """First-party modules of the window's folders, None if they are not indexed yet."""
+        if window is None or not window.folders():
+            return frozenset()
+
+        with self._lock:
+            entry = self._index.get(window.id())
+        if entry is None or entry[0] != tuple(window.folders()):
+            # never scan the folders on the calling (UI) thread
+            self.refresh_async(window)
+            return None
+        return entry[1]
+
+    def refresh_async(self, window: sublime.Window, force: bool = False) -> None:
+        folders = tuple(window.folders())
+        with self._lock:
+            entry = self._index.get(window.id())
+            pending = self._pending.get(window.id())
+            is_built = entry is not None and entry[0] == folders
+            is_building = pending is not None and pending[0] == folders
+            if not force and (is_built or is_building):
+                return
+            self._generation += 1
+            generation = self._generation
+            self._pending[window.id()] = (folders, generation)
+        sublime.set_timeout_async(lambda: self._build(window.id(), folders, generation))
+
+    def discard(self, window: sublime.Window) -> None:
+        with self._lock:
+            self._index.pop(window.id(), None)
+            self._pending.pop(window.id(), None)
+
+    def _build(self, window_id: int, folders: Tuple[str, ...], generation: int) -> None:
+        modules = find_first_party_modules(folders)
+        with self._lock:
+            if self._pending.get(window_id) == (folders, generation):
+                del self._pending[window_id]
+                self._index[window_id] = (folders, modules)
+
+first_party_index = FirstPartyIndex()
+
+class FirstPartyIndexListener(sublime_plugin.EventListener):
+    def on_activated_async(self, view: sublime.View):
+        window = view.window()
+        if window is not None and view.match_selector(0, 'source.python'):
+            first_party_index.refresh_async(window)
+
+    def on_load_project_async(self, window: sublime.Window):
+        first_party_index.refresh_async(window, force=True)
+
+    def on_post_window_command(self, window: sublime.Window, command_name: str, args):
+        # new packages may have been created inside the folders
+        if command_name == 'refresh_folder_list':
+            first_party_index.refresh_async(window, force=True)
+
+    def on_pre_close_window(self, window: sublime.Window):
+        first_party_index.discard(window)
+
+class ProjectSettings:
+    """Settings for the files of a window which are not open: the project file's, then the Python and global ones."""
+
+    def __init__(self, window: sublime.Window) -> None:
+        self.project_settings = (window.project_data() or {}).get('settings', {})
+
+    def get(self, name: str, default=None):
+        if name in self.project_settings:
+            return self.project_settings[name]
+        for settings_name in ('Python.sublime-settings', 'Preferences.sublime-settings'):
+            settings = sublime.load_settings(settings_name)
+            if settings.has(name):
+                return settings.get(name)
+        return default
+
+def group_sections(settings: Union[sublime.Settings, ProjectSettings]) -> bool:
+    return settings.get('sort_python_imports_group_sections', True)
+
+def is_python_view(view: sublime.View) -> bool:
+    file_name = view.file_name()
+    return view.match_selector(0, 'source.python') or (file_name is not None and file_name.endswith(('.py', '.pyi')))
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = new_thread_pool('sort_imports')
+    return _executor
+
+def plugin_unloaded():
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+
+def replace_minimal(view: sublime.View, edit: sublime.Edit, old_content: str, new_content: str) -> None:
+    """Replace the whole content of `view` by only touching the part that actually changed."""
+    if old_content == new_content:
+        return
+    begin, end, replacement = diff_span(old_content, new_content)
+    view.replace(edit, sublime.Region(begin, end), replacement)
@@ -15,34 +15,90 @@ How to set up?
         "chromedriver_path": "/path/to/chromedriver",
       },
     },
-- Change the path below (line 36) to where you installed selenium
+- Change `SELENIUM_SITE_PACKAGES` below to where you installed selenium
+
+Alternatively, add `"backend": "http"` to the args to submit over plain HTTP, without
+a browser. Selenium and chromedriver are not needed then (`chromedriver_path` can be omitted).
 
 Open command palette (Ctrl+shift+P) and type "Submit CSES Solution" to start submitting.
 
-When submitting, problem ID will be inferred from the file name if possible.
+When submitting, the problem is picked from a fuzzy-searchable list of the problem set,
+preselected from the file name (an ID like 1068.cpp, or the title like weird_algorithm.cpp).
+The list is kept in Sublime Text's cache directory and refreshed in the background once it
+is a week old, run "CSES: refresh problem list" to refresh it right away. Until the list is
+downloaded the first time, the problem ID is typed in instead.
 After your solution is submitted, you should see the status in the status bar
 (bottom left corner in Sublime Text), including submitting, submitted, verdict, etc.
+
+The headless browser is started and logged in on the first submission, and then reused
+for the next ones (it logs in again if the login has expired). It is closed when the plugin
+is unloaded, e.g. when Sublime Text exits. The http backend keeps its login cookies in
+Sublime Text's cache directory instead.
+
+Submissions run in the background, and the result page is polled (less and less often)
+until judging is done, so slow judging does not end up without a verdict. To submit several
+solutions at once, e.g. every modified *.cpp file in a folder, add a `submit_cses_folder`
+command with the same `username` and `password` args. It uses the http backend, submits up
+to `max_concurrent` solutions at a time and shows their progress in the "cses" output panel.
+Optional args: `folder` (defaults to the folder of the current file), `pattern` (*.cpp) and
+`only_modified` (true, skip files which did not change since they were last submitted).
+
+Add `"judge_locally": true` to the args of either command to compile the solution and run
+it on the examples of the problem first, it is only submitted if all of them pass. Custom
+tests can be added as `tests/PROBLEM_ID/NAME.in` and `NAME.out` files next to the solution.
+The compiler can be changed with `"compile_command"` (by default ["g++", "-std=c++20", "-O2", "-pipe"]).
+
+Every submission is recorded (with its verdict and test times) in a SQLite database in
+Sublime Text's cache directory. Submitting the same source to the same problem again only
+shows the verdict it already got, add `"force": true` to the args to submit it anyway.
+Run "CSES: show submissions" to list the submissions of the current problem.
 """
 
 import sublime
 import sublime_plugin
 from enum import Enum
 
+import fnmatch
 import os
 import re
 import sys
-from typing import Union
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Literal, Optional, Tuple, Union
+
+from .cses_client import CsesClient, CsesClientPool, CsesError, ProblemCatalog
+from .cses_history import Submission, SubmissionStore, hash_source, new_submission
+from .cses_judge import (
+    ACCEPTED,
+    DEFAULT_COMPILE_COMMAND,
+    JudgeError,
+    compile_solution,
+    load_tests,
+    run_tests,
+    save_tests,
+)
+
+# where selenium is installed, in case it can not be imported from the plugin host as it is
+SELENIUM_SITE_PACKAGES = '/usr/lib/python3.12/site-packages'  # change to where you installed selenium
 
-if '/usr/lib/python3.12/site-packages' not in sys.path:
-    sys.path.append('/usr/lib/python3.12/site-packages')  # change to where you installed selenium
+# selenium is only needed by the selenium backend, it is imported on its first use
+selenium = None
 
-import selenium.common.exceptions
-import selenium.webdriver as webdriver
-import selenium.webdriver.support.expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.wait import WebDriverWait
+# how long to wait for judging to be done, in seconds
+VERDICT_TIMEOUT = 600
+# how long `find_element` waits for an element to appear, in seconds
+IMPLICIT_WAIT = 3
 
+# submissions are waiting for their verdict most of the time, so they get their own threads
+# instead of blocking the shared async thread of sublime
+_executor: Optional[ThreadPoolExecutor] = None
+
+_catalog: Optional[ProblemCatalog] = None
+_store: Optional[SubmissionStore] = None
+_store_lock = threading.Lock()
+_catalog_refreshing = threading.Event()
 
 class CsesVerdict(Enum):
     AC = 'ACCEPTED'
@@ -51,6 +107,246 @@ class CsesVerdict(Enum):
     OLE = 'OUTPUT LIMIT EXCEEDED'
     MLE = 'MEMORY LIMIT EXCEEDED'
 
+class CsesSession:
+    """A headless browser logged in to CSES, reused across submissions."""
+
+    login_url = 'https://cses.fi/login'
+
+    def __init__(self, chromedriver_path: str, username: str, password: str) -> None:
+        self.chromedriver_path = chromedriver_path
+        self.username = username
+        self.password = password
+        self.driver: Optional['webdriver.Chrome'] = None
+
+        # a driver can only be used by one submission at a time
+        self.lock = threading.Lock()
+
+    def open(self, url: str) -> 'webdriver.Chrome':
+        """Open `url` in a logged in browser, must be called with `lock` held."""
+        driver = self.get_driver()
+        driver.get(url)
+        if self.is_logged_out():
+            # the session has expired (or this is a new browser)
+            self.login()
+            driver.get(url)
+        return driver
+
+    def get_driver(self) -> 'webdriver.Chrome':
+        if self.driver is not None:
+            try:
+                self.driver.current_url  # check if the browser is still alive
+                return self.driver
+            except selenium.common.exceptions.WebDriverException:
+                self.quit()
+
+        chrome_options = webdriver.ChromeOptions()
+        chrome_options.add_argument("--headless")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+        chrome_options.add_argument("--window-size=1080,1080")
+        service = Service(executable_path=self.chromedriver_path)
+        self.driver = webdriver.Chrome(options=chrome_options, service=service)
+        self.driver.implicitly_wait(IMPLICIT_WAIT)
+        return self.driver
+
+    def is_logged_out(self) -> bool:
+        assert self.driver is not None
+        # the page is already loaded, `find_elements` would wait for the whole implicit wait when logged in
+        with no_implicit_wait(self.driver):
+            return len(self.driver.find_elements(By.CSS_SELECTOR, '.controls .account[href="/login"]')) > 0
+
+    def login(self) -> None:
+        assert self.driver is not None
+        self.driver.get(self.login_url)
+        username_input = self.driver.find_element(By.CSS_SELECTOR, '#nick')
+        username_input.send_keys(self.username)
+        password_input = self.driver.find_element(By.CSS_SELECTOR, 'input[type="password"][name="pass"]')
+        password_input.send_keys(self.password)
+        login_button = self.driver.find_element(By.CSS_SELECTOR, 'form input[type="submit"]')
+        login_button.click()
+
+    def quit(self) -> None:
+        if self.driver is None:
+            return
+        try:
+            self.driver.quit()
+        except selenium.common.exceptions.WebDriverException as e:
+            print(f'Failed to close browser: {e}')
+        self.driver = None
+
+def import_selenium() -> bool:
+    """Import selenium for the selenium backend, returns whether it is installed."""
+    global selenium, webdriver, EC, Service, By, WebDriverWait
+    if selenium is not None:
+        return True
+    if SELENIUM_SITE_PACKAGES not in sys.path:
+        sys.path.append(SELENIUM_SITE_PACKAGES)
+    try:
+        import selenium.common.exceptions
+        import selenium.webdriver as webdriver
+        import selenium.webdriver.support.expected_conditions as EC
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.wait import WebDriverWait
+    except ImportError:
+        selenium = None
+        return False
+    return True
+
+@contextmanager
+def no_implicit_wait(driver: 'webdriver.Chrome'):
+    """Look up elements without waiting for them, e.g. to check if an element is absent or inside an explicit wait."""
+    driver.implicitly_wait(0)
+    try:
+        yield
+    finally:
+        driver.implicitly_wait(IMPLICIT_WAIT)
+
+_sessions: Dict[Tuple[str, str], CsesSession] = {}
+_sessions_lock = threading.Lock()
+
+def get_session(chromedriver_path: str, username: str, password: str) -> CsesSession:
+    with _sessions_lock:
+        key = (chromedriver_path, username)
+        session = _sessions.get(key)
+        if session is None or session.password != password:
+            if session is not None:
+                session.quit()
+            session = CsesSession(chromedriver_path, username, password)
+            _sessions[key] = session
+        return session
+
+_client_pools: Dict[str, CsesClientPool] = {}
+_client_pools_lock = threading.Lock()
+
+def get_client_pool(username: str, password: str) -> CsesClientPool:
+    with _client_pools_lock:
+        pool = _client_pools.get(username)
+        if pool is None or pool.password != password:
+            if pool is not None:
+                pool.close()
+            cookie_path = os.path.join(sublime.cache_path(), 'subl', f'cses_cookies_{username}.json')
+            pool = CsesClientPool(username, password, cookie_path=cookie_path)
+            _client_pools[username] = pool
+        return pool
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='submit_cses')
+    return _executor
+
+def get_catalog() -> ProblemCatalog:
+    global _catalog
+    if _catalog is None:
+        _catalog = ProblemCatalog(os.path.join(sublime.cache_path(), 'subl', 'cses_problems.json'))
+    return _catalog
+
+def refresh_catalog_async(force: bool = False, on_done=None) -> None:
+    """Download the problem list in the background if it is stale, `on_done` is called with an error or None."""
+    catalog = get_catalog()
+    if (not force and not catalog.is_stale()) or _catalog_refreshing.is_set():
+        return
+    _catalog_refreshing.set()
+
+    def refresh():
+        client = CsesClient('', '')  # the problem list does not need a login
+        error = None
+        try:
+            catalog.refresh(client)
+        except (CsesError, OSError) as e:
+            error = e
+            print(f'Failed to refresh CSES problem list: {e}')
+        finally:
+            client.close()
+            _catalog_refreshing.clear()
+        if on_done is not None:
+            on_done(error)
+
+    get_executor().submit(refresh)
+
+def get_store() -> SubmissionStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SubmissionStore(os.path.join(sublime.cache_path(), 'subl', 'cses_submissions.sqlite3'))
+        return _store
+
+def find_duplicate(problem_id: int, source_hash: str, report) -> bool:
+    """Report the verdict of an earlier submission of the same source, returns whether there is one."""
+    previous = get_store().find(problem_id, source_hash, 'C++', 'C++20')
+    if previous is None:
+        return False
+    assert previous.verdict is not None
+    report(f'Same source was already submitted | {format_verdict(previous.verdict, previous.test_times)}')
+    return True
+
+def guess_problem_id(file_path: str) -> Optional[int]:
+    problem_id = get_catalog().guess(file_path)
+    if problem_id is None:
+        problem_id = extract_id_from_file_path(file_path)
+    return problem_id
+
+def judge_solution(problem_id: int, solution_path: str, compile_command: Optional[List[str]], report) -> bool:
+    """Compile a solution and run it on the local tests of the problem, returns whether it passed all of them."""
+    judge_dir = os.path.join(sublime.cache_path(), 'subl', 'cses_judge')
+    example_dir = os.path.join(judge_dir, 'tests', str(problem_id))
+    try:
+        if not os.path.isdir(example_dir):
+            client = CsesClient('', '')  # problem statements do not need a login
+            try:
+                save_tests(example_dir, client.get_examples(problem_id))
+            finally:
+                client.close()
+        tests = load_tests(example_dir)
+        tests += load_tests(os.path.join(os.path.dirname(solution_path), 'tests', str(problem_id)))
+
+        report('Compiling solution...')
+        binary_path, _ = compile_solution(
+            solution_path,
+            os.path.join(judge_dir, 'bin'),
+            compile_command or DEFAULT_COMPILE_COMMAND,
+        )
+        results = run_tests(binary_path, tests) if tests else []
+    except JudgeError as e:
+        print(e)
+        report('Compilation failed (see console)')
+        return False
+    except (CsesError, OSError) as e:
+        report(f'Failed to judge solution locally: {e}')
+        return False
+
+    failed = [result for result in results if result.verdict != ACCEPTED]
+    times = ', '.join(f'{result.name} {result.time:.2f} s' for result in results)
+    if failed:
+        for result in failed:
+            print(f'Local test {result.name} of problem {problem_id}: {result.verdict}, output:\n{result.output}')
+        report(f'Local tests: {len(failed)}/{len(results)} failed, not submitting | {failed[0].name}: {failed[0].verdict}')
+        return False
+    report(f'Local tests: {len(results)} passed | {times}' if results else 'No local tests found')
+    return True
+
+def plugin_unloaded():
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+
+    with _sessions_lock:
+        # do not wait for running submissions, they will fail and report it
+        for session in _sessions.values():
+            session.quit()
+        _sessions.clear()
+
+    with _client_pools_lock:
+        for pool in _client_pools.values():
+            pool.close()
+        _client_pools.clear()
+
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
+
 class SubmitCsesCommand(sublime_plugin.TextCommand):
     def run(
         self,
@@ -58,23 +354,34 @@ class SubmitCsesCommand(sublime_plugin.TextCommand):
         username: str,
         password: str,
         problem_id: int,
-        chromedriver_path: str,
+        chromedriver_path: str = '',
+        backend: Literal['selenium', 'http'] = 'selenium',
+        judge_locally: bool = False,
+        compile_command: Optional[List[str]] = None,
+        force: bool = False,
     ):
         self.username = username
         self.password = password
         self.problem_id = problem_id
         self.chromedriver_path = chromedriver_path
+        self.backend = backend
+        self.judge_locally = judge_locally
+        self.compile_command = compile_command
+        self.force = force
 
         file_name = self.view.file_name()
         assert file_name is not None
 
-        sublime.set_timeout_async(self.submit_solution)
+        get_executor().submit(self.submit_solution)
 
     def is_enabled(self) -> bool:
         return self.view.file_name() is not None
 
-    def input(self, args) -> Union[sublime_plugin.TextInputHandler, None]:
+    def input(self, args) -> Union[sublime_plugin.CommandInputHandler, None]:
         if 'problem_id' not in args:
+            refresh_catalog_async()
+            if get_catalog().problems:
+                return ProblemListInputHandler(self.view)
             return ProblemIdInputHandler(self.view)
         return None
 
@@ -83,36 +390,54 @@ class SubmitCsesCommand(sublime_plugin.TextCommand):
         assert solution_path is not None
         problem_id = self.problem_id
 
+        window = self.view.window()
+        report = lambda message: window.status_message(message)
+        try:
+            source_hash = hash_source(solution_path)
+        except OSError as e:
+            report(f'Failed to read solution: {e}')
+            return
+        if not self.force and find_duplicate(problem_id, source_hash, report):
+            return
+        if self.judge_locally and not judge_solution(problem_id, solution_path, self.compile_command, report):
+            return
+
         submit_path = f'https://cses.fi/problemset/submit/{problem_id}'
-        self.view.window().status_message(f'Submitting solution...')
+        problem = get_catalog().get(problem_id)
+        if problem is not None:
+            self.view.window().status_message(f'Submitting solution to problem {problem_id}: {problem.title}...')
+        else:
+            self.view.window().status_message(f'Submitting solution...')
 
-        chrome_options = webdriver.ChromeOptions()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--window-size=1080,1080")
-        service = Service(executable_path=self.chromedriver_path)  # change to your chromedriver path
-        driver = webdriver.Chrome(options=chrome_options, service=service)
+        if self.backend == 'http':
+            self.submit_with_http(solution_path, source_hash)
+            return
+        if not import_selenium():
+            self.view.window().status_message('Selenium is not installed, use the http backend instead')
+            return
+
+        session = get_session(self.chromedriver_path, self.username, self.password)
+        with session.lock:
+            try:
+                self.submit_with_driver(session, submit_path, solution_path, source_hash)
+            except selenium.common.exceptions.WebDriverException as e:
+                # the browser may be in a bad state, start a new one for the next submission
+                session.quit()
+                self.view.window().status_message(f'Failed to submit solution: {e}')
 
-        driver.get(submit_path)
-        driver.implicitly_wait(3)
+    def submit_with_http(self, solution_path: str, source_hash: str) -> None:
+        window = self.view.window()
+        pool = get_client_pool(self.username, self.password)
+        submit_over_http(pool, self.problem_id, solution_path, source_hash, lambda message: window.status_message(message))
+
+    def submit_with_driver(self, session: CsesSession, submit_path: str, solution_path: str, source_hash: str) -> None:
+        problem_id = self.problem_id
+        driver = session.open(submit_path)
 
         # get problem name
         problem_title = driver.find_element(By.CSS_SELECTOR, '.navigation .title-block h1').text
         self.view.window().status_message(f'Found problem: {problem_title}')
 
-        # login
-        login_button = driver.find_element(By.CSS_SELECTOR, '.controls .account[href="/login"]')
-        login_button.click()
-        driver.implicitly_wait(1)
-
-        username_input = driver.find_element(By.CSS_SELECTOR, '#nick')
-        username_input.send_keys(self.username)
-        password_input = driver.find_element(By.CSS_SELECTOR, 'input[type="password"][name="pass"]')
-        password_input.send_keys(self.password)
-        login_button = driver.find_element(By.CSS_SELECTOR, 'form input[type="submit"]')
-        login_button.click()
-
         # submit solution
         choose_file_button = driver.find_element(By.CSS_SELECTOR, 'input[type="file"][name="file"]')
         lang = driver.find_element(By.CSS_SELECTOR, '#lang')
@@ -124,27 +449,237 @@ class SubmitCsesCommand(sublime_plugin.TextCommand):
         submit_solution_button.click()
         self.view.window().status_message(f'Submitted to problem {problem_id}: {problem_title}')
 
-        try:
-            verdict = WebDriverWait(driver, timeout=5).until(
-                EC.presence_of_element_located(
-                    (By.CSS_SELECTOR, ".summary-table .inline-score.verdict")
-                )
-            ).text
-            if verdict == CsesVerdict.AC.value:
-                code_time = -1.0
-                code_times = driver.find_elements(By.CSS_SELECTOR, 'table td.verdict.ac + td')
-                for item in code_times:
-                    test_code_time = item.text
-                    if test_code_time.endswith('s'):
-                        test_code_time = test_code_time[:-1].strip()
-                    test_code_time = float(test_code_time)
-                    code_time = max(code_time, test_code_time)
-                self.view.window().status_message(f'Verdict: {verdict} | Time: {code_time} s')
+        verdict = self.wait_for_verdict(driver)
+        if verdict is None:
+            self.view.window().status_message(f'Could not get verdict for problem {problem_title}')
+            return
+        test_times = []
+        for item in driver.find_elements(By.CSS_SELECTOR, 'table td.verdict.ac + td'):
+            test_code_time = item.text
+            if test_code_time.endswith('s'):
+                test_code_time = test_code_time[:-1].strip()
+            test_times.append(float(test_code_time))
+        get_store().add(new_submission(problem_id, solution_path, source_hash, verdict, test_times))
+        self.view.window().status_message(format_verdict(verdict, test_times))
+
+    def wait_for_verdict(self, driver: 'webdriver.Chrome', interval: float = 0.5, max_interval: float = 8) -> Optional[str]:
+        """Reload the result page until it shows a verdict, waiting twice as long after each reload."""
+        deadline = time.monotonic() + VERDICT_TIMEOUT
+        # with an implicit wait, every poll of the explicit wait would take the whole implicit wait
+        with no_implicit_wait(driver):
+            while True:
+                try:
+                    return WebDriverWait(driver, timeout=interval).until(
+                        EC.presence_of_element_located(
+                            (By.CSS_SELECTOR, ".summary-table .inline-score.verdict")
+                        )
+                    ).text
+                except selenium.common.exceptions.TimeoutException:
+                    pass
+                if time.monotonic() + interval > deadline:
+                    return None
+                interval = min(interval * 2, max_interval)
+                driver.refresh()
+
+class SubmitCsesFolderCommand(sublime_plugin.WindowCommand):
+    """Submit several solutions concurrently over http, e.g. all new solutions of a folder."""
+
+    def run(
+        self,
+        username: str,
+        password: str,
+        folder: str = '',
+        pattern: str = '*.cpp',
+        only_modified: bool = True,
+        max_concurrent: int = 3,
+        judge_locally: bool = False,
+        compile_command: Optional[List[str]] = None,
+    ):
+        folder = folder or self.default_folder() or ''
+        if not os.path.isdir(folder):
+            self.window.status_message(f'Folder not found: {folder}')
+            return
+
+        panel = self.window.create_output_panel('cses')
+        panel.settings().set('word_wrap', False)
+        self.window.run_command('show_panel', {'panel': 'output.cses'})
+
+        pool = get_client_pool(username, password)
+        get_executor().submit(
+            self.submit_folder, pool, folder, pattern, only_modified, max_concurrent, judge_locally, compile_command,
+        )
+
+    def is_enabled(self, **kwargs) -> bool:
+        return bool(kwargs.get('folder') or self.default_folder())
+
+    def default_folder(self) -> Optional[str]:
+        view = self.window.active_view()
+        file_name = view.file_name() if view is not None else None
+        return os.path.dirname(file_name) if file_name is not None else None
+
+    def submit_folder(
+        self,
+        pool: CsesClientPool,
+        folder: str,
+        pattern: str,
+        only_modified: bool,
+        max_concurrent: int,
+        judge_locally: bool,
+        compile_command: Optional[List[str]],
+    ) -> None:
+        solutions = []
+        num_unchanged = 0
+        for entry in sorted(os.scandir(folder), key=lambda entry: entry.name):
+            if not entry.is_file() or not fnmatch.fnmatch(entry.name, pattern):
+                continue
+            problem_id = guess_problem_id(entry.path)
+            if problem_id is None:
+                self.report(f'{entry.name}: skipped, could not find the problem from the file name')
+                continue
+            try:
+                source_hash = hash_source(entry.path)
+            except OSError as e:
+                self.report(f'{entry.name}: skipped, {e}')
+                continue
+            # a solution is modified if this exact source was never submitted to its problem
+            if only_modified and get_store().find(problem_id, source_hash, 'C++', 'C++20') is not None:
+                num_unchanged += 1
+                continue
+            solutions.append((problem_id, entry.path, source_hash))
+        if num_unchanged > 0:
+            self.report(f'Skipped {num_unchanged} solution(s) which were already submitted')
+        if not solutions:
+            self.report('No solutions to submit')
+            return
+
+        self.report(f'Submitting {len(solutions)} solution(s), {max_concurrent} at a time')
+        executor = ThreadPoolExecutor(max_workers=max(1, max_concurrent), thread_name_prefix='submit_cses_folder')
+        for problem_id, solution_path, source_hash in solutions:
+            executor.submit(
+                self.submit_solution, pool, problem_id, solution_path, source_hash, judge_locally, compile_command,
+            )
+        # the workers exit once all solutions are submitted
+        executor.shutdown(wait=False)
+
+    def submit_solution(
+        self,
+        pool: CsesClientPool,
+        problem_id: int,
+        solution_path: str,
+        source_hash: str,
+        judge_locally: bool,
+        compile_command: Optional[List[str]],
+    ) -> None:
+        name = os.path.basename(solution_path)
+        report = lambda message: self.report(f'{name}: {message}')
+        if judge_locally and not judge_solution(problem_id, solution_path, compile_command, report):
+            return
+        submit_over_http(pool, problem_id, solution_path, source_hash, report)
+
+    def report(self, message: str) -> None:
+        def append():
+            panel = self.window.find_output_panel('cses') or self.window.create_output_panel('cses')
+            panel.run_command('append', {'characters': message + '\n', 'force': True, 'scroll_to_end': True})
+            self.window.status_message(message)
+        sublime.set_timeout(append)
+
+def submit_over_http(pool: CsesClientPool, problem_id: int, solution_path: str, source_hash: str, report) -> Optional[str]:
+    """Submit a solution and wait for its verdict, `report` is called with every status update."""
+    try:
+        problem_title, result_path = pool.submit(problem_id, solution_path)
+        problem = get_catalog().get(problem_id)
+        if problem_title is None and problem is not None:
+            problem_title = problem.title
+        report(f'Submitted to problem {problem_id}: {problem_title}')
+        result = pool.wait_for_verdict(
+            result_path,
+            timeout=VERDICT_TIMEOUT,
+            on_status=lambda status: report(f'{problem_title}: {status}'),
+        )
+    except (CsesError, OSError) as e:
+        report(f'Failed to submit solution: {e}')
+        return None
+
+    if result.verdict is None:
+        report(f'Could not get verdict for problem {problem_title}')
+        return None
+    get_store().add(new_submission(problem_id, solution_path, source_hash, result.verdict, result.test_times))
+    report(format_verdict(result.verdict, result.test_times))
+    return result.verdict
+
+def format_verdict(verdict: str, test_times: List[float]) -> str:
+    if verdict == CsesVerdict.AC.value:
+        code_time = max(test_times, default=-1.0)
+        return f'Verdict: {verdict} | Time: {code_time} s'
+    return f'Verdict: {verdict}'
+
+
+class ShowCsesSubmissionsCommand(sublime_plugin.WindowCommand):
+    """List the submissions of a problem (by default the problem of the current file) in a quick panel."""
+
+    def run(self, problem_id: Optional[int] = None, all_problems: bool = False):
+        if problem_id is None and not all_problems:
+            view = self.window.active_view()
+            file_name = view.file_name() if view is not None else None
+            if file_name is not None:
+                problem_id = guess_problem_id(file_name)
+
+        submissions = get_store().list(problem_id)
+        if not submissions:
+            self.window.status_message('No submissions found')
+            return
+
+        items = []
+        for submission in submissions:
+            problem = get_catalog().get(submission.problem_id)
+            title = f'{submission.problem_id} {problem.title}' if problem is not None else str(submission.problem_id)
+            items.append(sublime.QuickPanelItem(
+                title,
+                details=format_verdict(submission.verdict or 'NO VERDICT', submission.test_times),
+                annotation=time.strftime('%Y-%m-%d %H:%M', time.localtime(submission.submitted_at)),
+            ))
+        self.window.show_quick_panel(items, lambda idx: self.on_select(submissions, idx))
+
+    def on_select(self, submissions: List[Submission], idx: int) -> None:
+        if idx < 0:
+            return
+        solution_path = submissions[idx].solution_path
+        if os.path.isfile(solution_path):
+            self.window.open_file(solution_path)
+
+class RefreshCsesProblemsCommand(sublime_plugin.ApplicationCommand):
+    def run(self):
+        sublime.status_message('Refreshing CSES problem list...')
+
+        def on_done(error: Optional[Exception]) -> None:
+            if error is not None:
+                sublime.status_message(f'Failed to refresh CSES problem list: {error}')
             else:
-                self.view.window().status_message(f'Verdict: {verdict}')
-        except selenium.common.exceptions.TimeoutException as e:
-            self.view.window().status_message(f'Could not get verdict for problem {problem_title}: {e}')
+                sublime.status_message(f'Found {len(get_catalog().problems)} CSES problems')
+
+        refresh_catalog_async(force=True, on_done=on_done)
+
+class ProblemListInputHandler(sublime_plugin.ListInputHandler):
+    def __init__(self, view: sublime.View) -> None:
+        self.view = view
+        file_name = self.view.file_name()
+        assert file_name is not None
+        self.problem_id = guess_problem_id(file_name)
+
+    def name(self) -> str:
+        return 'problem_id'
+
+    def placeholder(self) -> str:
+        return 'Problem ID or title'
 
+    def list_items(self):
+        items = []
+        selected_index = 0
+        for idx, problem in enumerate(get_catalog().problems.values()):
+            items.append(sublime.ListInputItem(f'{problem.id} {problem.title}', problem.id, annotation=problem.category))
+            if problem.id == self.problem_id:
+                selected_index = idx
+        return items, selected_index
 
 class ProblemIdInputHandler(sublime_plugin.TextInputHandler):
     def __init__(self, view: sublime.View) -> None:
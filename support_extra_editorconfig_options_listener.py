@@ -1,64 +1,277 @@
 """
-Add support for some .editorconfig options which sublime text does not natively support.
-Currently, the only added option is `max_line_length`.
+Add support for some .editorconfig options which sublime text does not natively support:
+- `max_line_length`: a ruler at the given column (rulers after it are dropped), `off` removes all rulers
+- `ij_visual_guides` (from JetBrains IDEs): more rulers, e.g. `80, 120`
+- `spelling_language`: spell checking with the dictionary of the language, e.g. `en-US`,
+  if such a dictionary is installed
+
+Parsed .editorconfig files are cached (see editorconfig_resolver.py), so opening many files
+of a project only parses each .editorconfig once, until it is modified.
+
+The options are resolved in the background: views loaded at about the same time (e.g. when
+a session is restored), or already open when the plugin is loaded, are resolved together,
+directory by directory, and only the final settings are applied on the main thread.
+
+When a .editorconfig is saved, the options of the open views under its directory are
+applied again. The settings as they were before this plugin changed them are kept, so an
+option can be changed or removed without reopening the files.
 """
 
 import sublime
 import sublime_plugin
 
-from editorconfig import get_properties, EditorConfigError
+import os
+import threading
+from typing import Dict, List, Mapping, Optional, Set, Tuple
 
+from editorconfig import EditorConfigError
 
-def config_extra_options(view: sublime.View):
-    file_name = view.file_name()
-    if file_name is None:
-        return
+from .editorconfig_resolver import CONFIG_FILE_NAME, EditorConfigResolver, resolve_properties
 
-    settings = view.settings()
-    rulers = settings.get('rulers', [])
-    try:
-        editorconfig_options = get_properties(file_name)
-        if editorconfig_options is None:
+# views loaded within this many milliseconds are resolved in one batch
+BATCH_DELAY = 50
+# views are updated this many milliseconds after the last save of a .editorconfig
+SAVE_DEBOUNCE_DELAY = 300
+
+# view setting with the original values of the settings which were changed by this plugin
+ORIGINAL_SETTINGS_KEY = 'editorconfig_extra_original_settings'
+
+resolver = EditorConfigResolver()
+
+_pending_views: Dict[str, List[sublime.View]] = {}  # directory -> views loaded since the last batch
+_pending_lock = threading.Lock()
+
+_saved_config_dirs: Set[str] = set()  # directories of the .editorconfig files saved since the last update
+_save_generation = 0
+_saved_lock = threading.Lock()
+
+
+class ViewIndex:
+    """Open views with a file, by directory, so that the views affected by a .editorconfig are found quickly."""
+
+    def __init__(self) -> None:
+        self._dirs: Dict[int, str] = {}  # view id -> directory
+        self._views: Dict[str, Dict[int, sublime.View]] = {}  # directory -> views
+        self._lock = threading.Lock()
+
+    def add(self, view: sublime.View, dir_path: str) -> bool:
+        """Add or move a view, returns whether its directory changed."""
+        with self._lock:
+            old_dir_path = self._dirs.get(view.id())
+            if old_dir_path == dir_path:
+                return False
+            self._remove(view.id())
+            self._dirs[view.id()] = dir_path
+            self._views.setdefault(dir_path, {})[view.id()] = view
+            return True
+
+    def remove(self, view: sublime.View) -> None:
+        with self._lock:
+            self._remove(view.id())
+
+    def views_under(self, dir_path: str) -> Dict[str, List[sublime.View]]:
+        """Views of the files inside `dir_path` (recursively), by directory."""
+        prefix = os.path.join(dir_path, '')
+        with self._lock:
+            return {
+                view_dir_path: list(views.values())
+                for view_dir_path, views in self._views.items()
+                if view_dir_path == dir_path or view_dir_path.startswith(prefix)
+            }
+
+    def _remove(self, view_id: int) -> None:
+        dir_path = self._dirs.pop(view_id, None)
+        if dir_path is None:
             return
+        views = self._views[dir_path]
+        del views[view_id]
+        if not views:
+            del self._views[dir_path]
+
+view_index = ViewIndex()
+
+def config_extra_options(views: List[sublime.View]):
+    """Resolve the extra options of views in the next batch, can be called from any thread."""
+    views_by_dir: Dict[str, List[sublime.View]] = {}
+    for view in views:
+        file_name = view.file_name()
+        if file_name is None:
+            continue
+
+        dir_path = os.path.dirname(os.path.abspath(file_name))
+        view_index.add(view, dir_path)
+        views_by_dir.setdefault(dir_path, []).append(view)
+    if views_by_dir:
+        schedule_views(views_by_dir)
+
+def schedule_views(views_by_dir: Dict[str, List[sublime.View]]):
+    with _pending_lock:
+        is_first = not _pending_views
+        for dir_path, views in views_by_dir.items():
+            _pending_views.setdefault(dir_path, []).extend(views)
+    if is_first:
+        sublime.set_timeout_async(resolve_pending_views, BATCH_DELAY)
+
+def resolve_pending_views():
+    global _pending_views
+    with _pending_lock:
+        pending_views, _pending_views = _pending_views, {}
+
+    resolved: List[Tuple[sublime.View, Mapping[str, str]]] = []
+    for dir_path, views in pending_views.items():
+        try:
+            chain = resolver.get_chain(dir_path)
+            for view in views:
+                file_name = view.file_name()
+                if file_name is not None:
+                    resolved.append((view, resolve_properties(chain, os.path.abspath(file_name))))
+        except EditorConfigError as e:
+            print(f'Cannot read editorconfig options: {e}')
+        except Exception as e:
+            print(f'Cannot read editorconfig options: {e}')
+
+    def apply():
+        for view, editorconfig_options in resolved:
+            if view.is_valid():
+                apply_extra_options(view, editorconfig_options)
 
-        # max_line_length option
-        max_line_length = editorconfig_options.get('max_line_length', None)
-        if max_line_length is None:
+    if resolved:
+        sublime.set_timeout(apply)
+
+def on_config_saved(config_path: str):
+    """Update the views affected by a saved .editorconfig, once no more .editorconfig is saved for a while."""
+    global _save_generation
+    with _saved_lock:
+        _saved_config_dirs.add(os.path.dirname(os.path.abspath(config_path)))
+        _save_generation += 1
+        generation = _save_generation
+    sublime.set_timeout_async(lambda: update_saved_config_dirs(generation), SAVE_DEBOUNCE_DELAY)
+
+def update_saved_config_dirs(generation: int):
+    with _saved_lock:
+        if generation != _save_generation:
+            # another .editorconfig was saved meanwhile, its update will handle this one as well
             return
+        config_dirs = list(_saved_config_dirs)
+        _saved_config_dirs.clear()
+
+    views_by_dir: Dict[str, List[sublime.View]] = {}
+    for config_dir in config_dirs:
+        views_by_dir.update(view_index.views_under(config_dir))
+    if views_by_dir:
+        schedule_views(views_by_dir)
+
+def apply_extra_options(view: sublime.View, editorconfig_options: Mapping[str, str]):
+    settings = view.settings()
+    original_settings = settings.get(ORIGINAL_SETTINGS_KEY, {})
+
+    def original(name: str):
+        return original_settings[name] if name in original_settings else settings.get(name)
+
+    new_settings = {}
+    rulers = get_rulers(editorconfig_options, original('rulers') or [])
+    if rulers is not None:
+        new_settings['rulers'] = rulers
+    dictionary = get_dictionary(editorconfig_options)
+    if dictionary is not None:
+        new_settings['dictionary'] = dictionary
+        new_settings['spell_check'] = True
+
+    for name in set(original_settings) | set(new_settings):
+        if name in new_settings:
+            if name not in original_settings:
+                original_settings[name] = settings.get(name)
+            settings.set(name, new_settings[name])
+        else:
+            # the option was removed from the .editorconfig
+            if original_settings[name] is None:
+                settings.erase(name)
+            else:
+                settings.set(name, original_settings[name])
+            del original_settings[name]
+
+    if original_settings:
+        settings.set(ORIGINAL_SETTINGS_KEY, original_settings)
+    else:
+        settings.erase(ORIGINAL_SETTINGS_KEY)
+
+def get_rulers(editorconfig_options: Mapping[str, str], rulers: List) -> Optional[List]:
+    """Rulers of a view with `rulers` originally, None if they are not changed."""
+    max_line_length = editorconfig_options.get('max_line_length', None)
+    visual_guides = editorconfig_options.get('ij_visual_guides', None)
+    if max_line_length is None and visual_guides is None:
+        return None
+
+    new_rulers = list(rulers)
+    if max_line_length == 'off':
+        new_rulers = []
+    elif max_line_length is not None and max_line_length.isdigit():
+        max_line_length = int(max_line_length)
+        # all ruler length that larger than `max_line_length` will be dropped
+        in_rulers = False
+        new_rulers = []
+        for ruler in rulers:
+            if isinstance(ruler, int):
+                if ruler > max_line_length:
+                    continue
+                if ruler == max_line_length:
+                    in_rulers = True
+            elif isinstance(ruler, list):
+                if (len(ruler) == 0 or ruler[0] > max_line_length):
+                    continue
+                if ruler[0] == max_line_length:
+                    in_rulers = True
 
-        if max_line_length == 'off':
-            settings.set('rulers', [])
-        elif max_line_length.isdigit():
-            max_line_length = int(max_line_length)
-            # all ruler length that larger than `max_line_length` will be dropped
-            in_rulers = False
-            new_rulers = []
-            for ruler in rulers:
-                if isinstance(ruler, int):
-                    if ruler > max_line_length:
-                        continue
-                    if ruler == max_line_length:
-                        in_rulers = True
-                elif isinstance(ruler, list):
-                    if (len(ruler) == 0 or ruler[0] > max_line_length):
-                        continue
-                    if ruler[0] == max_line_length:
-                        in_rulers = True
-
-                new_rulers.append(ruler)
-
-            if not in_rulers:
-                new_rulers.append(max_line_length)
-            settings.set('rulers', new_rulers)
-
-    except EditorConfigError as e:
-        print(f'Cannot read editorconfig options: {e}')
-    except Exception as e:
-        print(f'Cannot read editorconfig options: {e}')
+            new_rulers.append(ruler)
+
+        if not in_rulers:
+            new_rulers.append(max_line_length)
+
+    if visual_guides is not None:
+        columns = {ruler[0] if isinstance(ruler, list) and ruler else ruler for ruler in new_rulers}
+        for guide in visual_guides.split(','):
+            guide = guide.strip()
+            if guide.isdigit() and int(guide) not in columns:
+                columns.add(int(guide))
+                new_rulers.append(int(guide))
+    return new_rulers
+
+def get_dictionary(editorconfig_options: Mapping[str, str]) -> Optional[str]:
+    """Resource path of the dictionary of `spelling_language`, e.g. en-US -> .../en_US.dic."""
+    language = editorconfig_options.get('spelling_language', None)
+    if not language:
+        return None
+
+    language = language.replace('-', '_')
+    # `en` matches the first installed english dictionary
+    for file_name in (f'{language}.dic', f'{language}_*.dic'):
+        resources = sublime.find_resources(file_name)
+        if resources:
+            return resources[0]
+    return None
 
 class SupportExtraEditorconfigOptionsEventListener(sublime_plugin.EventListener):
-    def on_clone(self, view: sublime.View):
-        config_extra_options(view)
-        
-    def on_load(self, view: sublime.View):
-        config_extra_options(view)
+    def on_init(self, views: List[sublime.View]):
+        # views which were open before the plugin was loaded, they are not indexed by the other events
+        config_extra_options(views)
+
+    def on_clone_async(self, view: sublime.View):
+        config_extra_options([view])
+
+    def on_load_async(self, view: sublime.View):
+        config_extra_options([view])
+
+    def on_post_save_async(self, view: sublime.View):
+        file_name = view.file_name()
+        if file_name is None:
+            return
+        if os.path.basename(file_name) == CONFIG_FILE_NAME:
+            on_config_saved(file_name)
+
+        # the file may have been saved to another directory
+        dir_path = os.path.dirname(os.path.abspath(file_name))
+        if view_index.add(view, dir_path):
+            schedule_views({dir_path: [view]})
+
+    def on_close(self, view: sublime.View):
+        view_index.remove(view)
@@ -0,0 +1,199 @@
+"""
+A local HTTP server imitating the CSES login, submit and result pages, enough for `CsesClient`.
+
+Usage:
+    server = CsesStubServer(username='me', password='secret')
+    server.start()
+    client = CsesClient('me', 'secret', base_url=server.base_url)
+    ...
+    server.stop()
+
+A submission is PENDING, then TESTING, then judged with `verdict` once its result page was
+loaded `num_polls_until_judged` times (the redirect right after submitting included).
+"""
+
+import re
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+CSRF_TOKEN = 'stub-csrf-token'
+
+
+class StubSubmission:
+    def __init__(self, problem_id: int, language: str, option: str, source: bytes) -> None:
+        self.problem_id = problem_id
+        self.language = language
+        self.option = option
+        self.source = source
+        self.num_polls = 0
+
+class CsesStubServer:
+    def __init__(
+        self,
+        username: str = 'user',
+        password: str = 'password',
+        verdict: str = 'ACCEPTED',
+        test_times: Optional[List[float]] = None,
+        num_polls_until_judged: int = 4,
+    ) -> None:
+        self.username = username
+        self.password = password
+        self.verdict = verdict
+        self.test_times = test_times if test_times is not None else [0.01, 0.02]
+        self.num_polls_until_judged = num_polls_until_judged
+        self.sessions: Dict[str, bool] = {}  # session id -> logged in
+        self.submissions: Dict[str, StubSubmission] = {}
+        self.num_logins = 0
+        self.lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_port}'
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def expire_sessions(self) -> None:
+        with self.lock:
+            self.sessions.clear()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                session_id = self.session_id()
+                if self.path == '/login':
+                    if session_id is None:
+                        session_id = uuid.uuid4().hex
+                        with server.lock:
+                            server.sessions[session_id] = False
+                    self.send_page(self.header() + (
+                        '<form method="post" action="">'
+                        f'<input type="hidden" name="csrf_token" value="{CSRF_TOKEN}">'
+                        '<input id="nick" name="nick"><input type="password" name="pass">'
+                        '<input type="submit" value="Submit"></form>'
+                    ), [('Set-Cookie', f'PHPSESSID={session_id}; path=/')])
+                elif re.fullmatch(r'/problemset/submit/\d+/', self.path):
+                    problem_id = self.path.split('/')[3]
+                    form = (
+                        '<form action="/course/send.php" method="post" enctype="multipart/form-data">'
+                        f'<input type="hidden" name="csrf_token" value="{CSRF_TOKEN}">'
+                        f'<input type="hidden" name="task" value="{problem_id}">'
+                        '<input type="file" name="file">'
+                        '<select name="lang" id="lang"><option value="C++">C++</option></select>'
+                        '<select name="option" id="option"><option value="C++17">C++17</option>'
+                        '<option value="C++20">C++20</option></select>'
+                        '<input type="submit" value="Submit"></form>'
+                    )
+                    self.send_page(
+                        self.header() +
+                        '<div class="navigation"><div class="title-block"><h1>Weird Algorithm</h1></div></div>' +
+                        (form if self.is_logged_in() else '')
+                    )
+                elif re.fullmatch(r'/problemset/result/\w+/', self.path):
+                    with server.lock:
+                        submission = server.submissions.get(self.path.split('/')[3])
+                        if submission is not None:
+                            submission.num_polls += 1
+                    if submission is None or not self.is_logged_in():
+                        self.send_page(self.header() + 'Not found', status=404)
+                    else:
+                        self.send_page(self.header() + self.result(submission))
+                else:
+                    self.send_page('Not found', status=404)
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get('Content-Length', '0')))
+                if self.path == '/login':
+                    fields = parse_qs(body.decode())
+                    session_id = self.session_id()
+                    if (
+                        session_id is not None and
+                        fields.get('csrf_token') == [CSRF_TOKEN] and
+                        fields.get('nick') == [server.username] and
+                        fields.get('pass') == [server.password]
+                    ):
+                        with server.lock:
+                            server.sessions[session_id] = True
+                            server.num_logins += 1
+                        self.send_page('', [('Location', '/')], status=303)
+                    else:
+                        self.send_page(self.header() + 'Invalid username or password')
+                elif self.path == '/course/send.php' and self.is_logged_in():
+                    fields = parse_multipart(body, self.headers['Content-Type'])
+                    submission_id = uuid.uuid4().hex[:8]
+                    with server.lock:
+                        server.submissions[submission_id] = StubSubmission(
+                            int(fields['task']),
+                            fields['lang'].decode(),
+                            fields['option'].decode(),
+                            fields['file'],
+                        )
+                    self.send_page('', [('Location', f'/problemset/result/{submission_id}/')], status=303)
+                else:
+                    self.send_page('Forbidden', status=403)
+
+            def session_id(self) -> Optional[str]:
+                match = re.search(r'PHPSESSID=(\w+)', self.headers.get('Cookie') or '')
+                return match.group(1) if match is not None else None
+
+            def is_logged_in(self) -> bool:
+                with server.lock:
+                    return server.sessions.get(self.session_id() or '', False)
+
+            def header(self) -> str:
+                if self.is_logged_in():
+                    return '<div class="controls"><a class="account" href="/user/1">user</a></div>'
+                return '<div class="controls"><a class="account" href="/login">Login</a></div>'
+
+            def result(self, submission: StubSubmission) -> str:
+                if submission.num_polls < server.num_polls_until_judged:
+                    status = 'PENDING' if submission.num_polls <= 2 else 'TESTING'
+                    return f'<table class="summary-table"><tr><td>Status:</td><td><span id="status">{status}</span></td></tr></table>'
+                tests = ''.join(
+                    f'<tr><td>#{idx}</td><td class="verdict ac">ACCEPTED</td><td>{test_time:.2f} s</td></tr>'
+                    for idx, test_time in enumerate(server.test_times, start=1)
+                )
+                return (
+                    '<table class="summary-table"><tr><td>Status:</td><td><span id="status">READY</span></td></tr>'
+                    f'<tr><td>Result:</td><td><span class="inline-score verdict">{server.verdict}</span></td></tr></table>'
+                    f'<table>{tests}</table>'
+                )
+
+            def send_page(self, text: str, headers=(), status: int = 200) -> None:
+                data = text.encode()
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+def parse_multipart(body: bytes, content_type: str) -> Dict[str, bytes]:
+    boundary = re.search(r'boundary=(\S+)', content_type).group(1).encode()
+    fields = {}
+    for part in body.split(b'--' + boundary)[1:-1]:
+        # each part is between the '\r\n' ending the boundary line and the one starting the next boundary
+        headers, _, value = part[2:-2].partition(b'\r\n\r\n')
+        name = re.search(rb'name="([^"]+)"', headers).group(1).decode()
+        fields[name] = value
+    return fields
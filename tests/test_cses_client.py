@@ -0,0 +1,101 @@
+"""
+Tests of the http backend against a local stub of CSES (see cses_stub_server.py).
+
+Run from the repository root:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cses_client import CsesClientPool, CsesError, load_cookies  # noqa: E402
+from cses_stub_server import CsesStubServer  # noqa: E402
+
+SOLUTION = b'#include <iostream>\nint main() { std::cout << 1 << "\\n"; }\n'
+
+
+class CsesClientPoolTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = CsesStubServer(username='user', password='secret', test_times=[0.01, 0.25])
+        self.server.start()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cookie_path = os.path.join(self.temp_dir.name, 'cookies.json')
+        self.solution_path = os.path.join(self.temp_dir.name, '1068.cpp')
+        with open(self.solution_path, 'wb') as f:
+            f.write(SOLUTION)
+        self.pool = self.new_pool('secret')
+
+    def tearDown(self) -> None:
+        self.pool.close()
+        self.server.stop()
+        self.temp_dir.cleanup()
+
+    def new_pool(self, password: str) -> CsesClientPool:
+        return CsesClientPool('user', password, base_url=self.server.base_url, cookie_path=self.cookie_path)
+
+    def test_submit_logs_in_and_sends_the_form(self) -> None:
+        title, result_path = self.pool.submit(1068, self.solution_path)
+
+        self.assertEqual(title, 'Weird Algorithm')
+        self.assertRegex(result_path, r'^/problemset/result/\w+/$')
+        submission = self.server.submissions[result_path.split('/')[3]]
+        self.assertEqual(submission.problem_id, 1068)
+        self.assertEqual(submission.language, 'C++')
+        self.assertEqual(submission.option, 'C++20')
+        self.assertEqual(submission.source, SOLUTION)
+        self.assertEqual(self.server.num_logins, 1)
+        self.assertIn('PHPSESSID', load_cookies(self.cookie_path))
+
+    def test_wait_for_verdict_polls_until_judged(self) -> None:
+        _, result_path = self.pool.submit(1068, self.solution_path)
+        statuses = []
+        result = self.pool.wait_for_verdict(result_path, interval=0.01, max_interval=0.02, on_status=statuses.append)
+
+        self.assertEqual(result.verdict, 'ACCEPTED')
+        self.assertEqual(result.test_times, [0.01, 0.25])
+        self.assertEqual(statuses, ['PENDING', 'TESTING'])
+
+    def test_wait_for_verdict_times_out(self) -> None:
+        self.server.num_polls_until_judged = 1000
+        _, result_path = self.pool.submit(1068, self.solution_path)
+        result = self.pool.wait_for_verdict(result_path, timeout=0.05, interval=0.01, max_interval=0.01)
+
+        self.assertIsNone(result.verdict)
+        self.assertIn(result.status, ('PENDING', 'TESTING'))
+
+    def test_login_is_reused_and_renewed(self) -> None:
+        self.pool.submit(1068, self.solution_path)
+        # the cookies are saved, so a new pool does not log in again
+        self.pool.close()
+        self.pool = self.new_pool('secret')
+        self.pool.submit(1068, self.solution_path)
+        self.assertEqual(self.server.num_logins, 1)
+
+        self.server.expire_sessions()
+        self.pool.submit(1068, self.solution_path)
+        self.assertEqual(self.server.num_logins, 2)
+
+    def test_concurrent_submissions(self) -> None:
+        def submit_and_wait(_) -> str:
+            _, result_path = self.pool.submit(1068, self.solution_path)
+            return self.pool.wait_for_verdict(result_path, interval=0.01, max_interval=0.02).verdict
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            verdicts = list(executor.map(submit_and_wait, range(8)))
+        self.assertEqual(verdicts, ['ACCEPTED'] * 8)
+        self.assertEqual(len(self.server.submissions), 8)
+
+    def test_wrong_password(self) -> None:
+        self.pool.close()
+        self.pool = self.new_pool('wrong')
+        with self.assertRaises(CsesError):
+            self.pool.submit(1068, self.solution_path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""
+Parity tests of editorconfig_resolver.py against `editorconfig.get_properties`, on generated
+directory trees. They are skipped when the editorconfig package is not installed.
+
+Run from the repository root:
+    python -m unittest discover tests
+"""
+
+import os
+import random
+import sys
+import tempfile
+import unittest
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import editorconfig
+    from editorconfig.exceptions import ParsingError
+except ImportError:
+    raise unittest.SkipTest('the editorconfig package is not installed')
+
+from editorconfig_resolver import EditorConfigResolver  # noqa: E402
+
+DIRS = ['', 'a', 'a/b', 'a/b/c', 'd']
+FILE_NAMES = ['x.py', 'y.md', 'z.txt', 'Makefile']
+GLOBS = ['*', '*.py', '*.{md,txt}', '/a/**', 'b/*.py', '[Mm]akefile', '**/c/*', 'x.py', '\\#*']
+OPTIONS = ['indent_style', 'indent_size', 'tab_width', 'max_line_length', 'charset', 'Spelling_Language']
+VALUES = ['tab', 'Space', '4', '2', 'off', 'UTF-8', 'en-US', '""', 'a' * 300]
+# lines which are not options or sections, most of them parsed differently than one may expect
+ODD_LINES = [
+    '',
+    '# comment',
+    '; comment',
+    '  # indented comment',
+    '  ; key = value',
+    '\tindent_size = 3',
+    'max_line_length = 100 # inline comment',
+    'max_line_length = 100\t# tab before the comment',
+    'max_line_length = 100;not a comment',
+    'key: value',
+    'o' * 60 + ' = long option',
+]
+
+
+def random_config(rng: random.Random) -> str:
+    lines: List[str] = []
+    if rng.random() < 0.3:
+        lines.append(f'root = {rng.choice(["true", "TRUE", "false"])}')
+    for _ in range(rng.randint(0, 4)):
+        lines.append(f'[{rng.choice(GLOBS)}]')
+        for _ in range(rng.randint(0, 4)):
+            if rng.random() < 0.2:
+                lines.append(rng.choice(ODD_LINES))
+            else:
+                lines.append(f'{rng.choice(OPTIONS)} {rng.choice("=:")} {rng.choice(VALUES)}')
+    return ('\ufeff' if rng.random() < 0.3 else '') + '\n'.join(lines) + '\n'
+
+def properties_or_error(get_properties, file_path: str):
+    try:
+        return dict(get_properties(file_path))
+    except ParsingError:
+        return ParsingError
+
+class EditorConfigResolverParityTest(unittest.TestCase):
+    def test_generated_trees(self) -> None:
+        rng = random.Random(0)
+        for _ in range(200):
+            with tempfile.TemporaryDirectory() as temp_dir:
+                temp_dir = os.path.realpath(temp_dir)
+                # the configs above the tree are not generated, so the top one is always root
+                configs = {'': 'root = true\n' + random_config(rng)}
+                for dir_name in DIRS[1:]:
+                    if rng.random() < 0.6:
+                        configs[dir_name] = random_config(rng)
+                for dir_name in DIRS:
+                    os.makedirs(os.path.join(temp_dir, dir_name), exist_ok=True)
+                for dir_name, config in configs.items():
+                    with open(os.path.join(temp_dir, dir_name, '.editorconfig'), 'w', encoding='utf-8') as f:
+                        f.write(config)
+
+                resolver = EditorConfigResolver()
+                for dir_name in DIRS:
+                    for file_name in FILE_NAMES:
+                        file_path = os.path.join(temp_dir, dir_name, file_name)
+                        self.assertEqual(
+                            properties_or_error(resolver.get_properties, file_path),
+                            properties_or_error(editorconfig.get_properties, file_path),
+                            f'{file_path}, with configs {configs!r}',
+                        )
+
+    def test_bom_before_root(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_dir = os.path.realpath(temp_dir)
+            sub_dir = os.path.join(temp_dir, 'sub')
+            os.makedirs(sub_dir)
+            with open(os.path.join(temp_dir, '.editorconfig'), 'w', encoding='utf-8') as f:
+                f.write('root = true\n[*]\nmax_line_length = 80\n')
+            with open(os.path.join(sub_dir, '.editorconfig'), 'w', encoding='utf-8') as f:
+                f.write('\ufeffroot = true\n[*]\nindent_size = 2\n')
+
+            file_path = os.path.join(sub_dir, 'x.py')
+            expected = {'indent_size': '2', 'tab_width': '2'}
+            self.assertEqual(dict(editorconfig.get_properties(file_path)), expected)
+            self.assertEqual(dict(EditorConfigResolver().get_properties(file_path)), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Tests of the removal of unused imports (`remove_unused`) of python_import_sorter.py.
+
+Run from the repository root:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from python_import_sorter import sort_file, sort_imports  # noqa: E402
+
+FIRST_PARTY = frozenset({'pkg'})
+
+
+class RemoveUnusedImportsTest(unittest.TestCase):
+    def assertPruned(self, source: str, expected: str) -> None:
+        result = sort_imports(source, first_party=FIRST_PARTY, remove_unused=True)
+        self.assertEqual(result, expected)
+        # pruning again does not change anything
+        self.assertEqual(sort_imports(result, first_party=FIRST_PARTY, remove_unused=True), result)
+
+    def test_unused_names_are_removed(self) -> None:
+        self.assertPruned(
+            'import sys\nimport os\nfrom os import path, sep\n\n\nprint(os.name, path)\n',
+            'import os\nfrom os import path\n\n\nprint(os.name, path)\n',
+        )
+
+    def test_all_keeps_names(self) -> None:
+        self.assertPruned(
+            "from os import path, sep\n\n__all__ = ['path']\n",
+            "from os import path\n\n__all__ = ['path']\n",
+        )
+        self.assertPruned(
+            "from os import path, sep\n\n__all__ = ('path',)\n__all__ += ['sep']\n",
+            "from os import path, sep\n\n__all__ = ('path',)\n__all__ += ['sep']\n",
+        )
+        self.assertPruned(
+            "from os import path, sep\n\n__all__ = []\n__all__.extend(['sep'])\n",
+            "from os import sep\n\n__all__ = []\n__all__.extend(['sep'])\n",
+        )
+
+    def test_forward_references_keep_names(self) -> None:
+        source = (
+            'import decimal\n'
+            'from collections import OrderedDict\n'
+            'from typing import List, TypeVar, cast\n'
+            '\n'
+            'from pkg import Base\n'
+            '\n'
+            '\n'
+            "T = TypeVar('T', bound='Base')\n"
+            '\n'
+            '\n'
+            'def f(x: \'List["OrderedDict[str, int]"]\') -> None:\n'
+            "    return cast('decimal.Decimal', x)\n"
+        )
+        self.assertPruned(source, source)
+
+    def test_explicit_re_exports_future_and_noqa_are_kept(self) -> None:
+        source = 'from __future__ import annotations\n\nimport json  # noqa\n\nimport numpy as numpy\n'
+        self.assertPruned(source, source)
+
+    def test_unused_section_is_removed_with_its_blank_lines(self) -> None:
+        self.assertPruned(
+            'import os\n\nimport requests\n\nfrom pkg import a\n\n\nprint(os.sep, a)\n',
+            'import os\n\nfrom pkg import a\n\n\nprint(os.sep, a)\n',
+        )
+        self.assertPruned(
+            'import os\n\nimport requests\n\n\nprint(os.sep)\n',
+            'import os\n\n\nprint(os.sep)\n',
+        )
+
+    def test_unused_section_at_end_of_file_is_removed(self) -> None:
+        self.assertPruned('print(1)\n\nimport requests\n', 'print(1)\n')
+
+    def test_package_init_is_not_pruned(self) -> None:
+        source = 'from .other import bar\nfrom .sub import foo\n'
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for file_name in ('__init__.py', '__init__.pyi', 'module.py'):
+                file_path = os.path.join(temp_dir, file_name)
+                with open(file_path, 'w') as f:
+                    f.write(source)
+                changed = sort_file(file_path, first_party=FIRST_PARTY, remove_unused=True)
+                with open(file_path) as f:
+                    content = f.read()
+
+                if file_name == 'module.py':
+                    self.assertTrue(changed)
+                    self.assertEqual(content, '')
+                else:
+                    self.assertFalse(changed, file_name)
+                    self.assertEqual(content, source)
+
+if __name__ == '__main__':
+    unittest.main()
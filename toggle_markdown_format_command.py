@@ -4,64 +4,123 @@ Toggle format between normal Markdown and DMOJ-style Markdown.
 DMOJ uses `~` for inline math instead of `$`. For example:
 - Normal Markdown: $y = x^2$
 - DMOJ Markdown: ~y = x^2~
+
+The current content of the view is converted (unsaved edits included), math-like text in
+fenced code blocks, inline code and escaped delimiters (`\\$`, `\\~`) is left untouched.
+Only the delimiters themselves are replaced, so the selection, the scroll position and
+the highlighting of the rest of the view are kept.
+
+`convert_markdown_files` converts every .md file of the window's folders (or of `dirs`)
+at once, in the background. Files which were already converted by it and did not change
+since are skipped, and so are files with unsaved changes in an open view. The same can be
+done from a terminal with `python dmoj_markdown.py PATH...`.
 """
 
 import sublime
 import sublime_plugin
 
-import subprocess
+import os
+import threading
 from pathlib import Path
+from typing import List, Optional, Set
+
+from .batch_processing import new_thread_pool
+from .dmoj_markdown import (
+    DMOJ_DELIMITER,
+    NORMAL_DELIMITER,
+    ConversionManifest,
+    convert_file_if_changed,
+    find_math_delimiters,
+    iter_markdown_files,
+    replace_delimiters,
+)
+
+# with more delimiters than this, a single replace of the changed span is faster than one edit per delimiter
+MAX_DELIMITER_EDITS = 5000
 
 
 class ConvertToDmojCommand(sublime_plugin.TextCommand):
     def run(self, edit: sublime.Edit):
-        file_name = self.view.file_name()
-        if file_name is None:
-            # unsaved file
-            return
-
-        file_extension = Path(file_name).suffix
-        file_extension = file_extension.lower()
-        if file_extension != '.md':
-            # not a markdown file
-            return
-
-        command = [
-            r'sed',
-            r'-r',
-            # r'-e', r'/./,$!d', # remove leading blank lines
-            r'-e', r's/\$([^$]+)\$/~\1~/g',
-            r'-e', r's/\$~/$$/g',
-            r'-e', r's/~\$/$$/g'
-        ]
-        with open(file_name, 'r', encoding='utf-8') as file:
-            completed_process = subprocess.run(command, input=file.read().encode(), capture_output=True)
-
-            result_content = completed_process.stdout.decode()
-            self.view.replace(edit, sublime.Region(0, self.view.size()), result_content)
+        replace_delimiters_in_view(self.view, edit, NORMAL_DELIMITER, DMOJ_DELIMITER)
+
+    def is_enabled(self) -> bool:
+        return is_markdown_view(self.view)
 
 
 class RestoreFromDmojCommand(sublime_plugin.TextCommand):
     def run(self, edit: sublime.Edit):
-        file_name = self.view.file_name()
-        if file_name is None:
-            # unsaved file
-            return
-
-        file_extension = Path(file_name).suffix
-        file_extension = file_extension.lower()
-        if file_extension != '.md':
-            # not a markdown file
-            return
-
-        command = [
-            r'sed',
-            r'-r',
-            # r'-e', r'/./,$!d', # remove leading blank lines
-            r'-e', r's/~([^~]+)~/$\1$/g',
-        ]
-        with open(file_name, 'r', encoding='utf-8') as file:
-            completed_process = subprocess.run(command, input=file.read().encode(), capture_output=True)
-
-            result_content = completed_process.stdout.decode()
-            self.view.replace(edit, sublime.Region(0, self.view.size()), result_content)
+        replace_delimiters_in_view(self.view, edit, DMOJ_DELIMITER, NORMAL_DELIMITER)
+
+    def is_enabled(self) -> bool:
+        return is_markdown_view(self.view)
+
+
+class ConvertMarkdownFilesCommand(sublime_plugin.WindowCommand):
+    def run(self, dirs: Optional[List[str]] = None, restore: bool = False):
+        paths = dirs or self.window.folders()
+        # do not overwrite files with unsaved changes
+        dirty_files = {
+            view.file_name() for view in self.window.views()
+            if view.is_dirty() and view.file_name() is not None
+        }
+        self.window.status_message('Converting Markdown files...')
+        threading.Thread(target=self.convert_files, args=(paths, not restore, dirty_files), daemon=True).start()
+
+    def is_enabled(self, dirs: Optional[List[str]] = None, restore: bool = False) -> bool:
+        return bool(dirs or self.window.folders())
+
+    def convert_files(self, paths: List[str], dmoj: bool, dirty_files: Set[str]) -> None:
+        manifest = ConversionManifest(os.path.join(sublime.cache_path(), 'subl', 'dmoj_manifest.json'))
+        file_paths = []
+        num_skipped = 0
+        for file_path in iter_markdown_files(paths):
+            if file_path in dirty_files or manifest.is_unchanged(file_path, dmoj):
+                num_skipped += 1
+            else:
+                file_paths.append(file_path)
+
+        with new_thread_pool('convert_markdown') as executor:
+            results = list(executor.map(
+                lambda file_path: convert_file_if_changed(file_path, manifest.known_hash(file_path, dmoj), dmoj, False),
+                file_paths,
+            ))
+
+        num_changed = 0
+        num_errors = 0
+        for file_path, changed, content_hash, error in results:
+            if error is not None:
+                num_errors += 1
+                print(f'Failed to convert {file_path}: {error}')
+                continue
+            num_changed += changed
+            if content_hash is not None:
+                manifest.record(file_path, dmoj, content_hash)
+        manifest.save()
+
+        message = f'Converted {num_changed} file(s), skipped {num_skipped + len(file_paths) - num_changed - num_errors}'
+        if num_errors > 0:
+            message += f', {num_errors} failed (see console)'
+        sublime.set_timeout(lambda: self.window.status_message(message))
+
+
+def replace_delimiters_in_view(view: sublime.View, edit: sublime.Edit, delimiter: str, new_delimiter: str) -> None:
+    content = view.substr(sublime.Region(0, view.size()))
+    offsets = find_math_delimiters(content, delimiter)
+    if not offsets:
+        return
+
+    if len(offsets) > MAX_DELIMITER_EDITS:
+        begin, end = offsets[0], offsets[-1] + 1
+        replacement = replace_delimiters(content[begin:end], [offset - begin for offset in offsets], new_delimiter)
+        view.replace(edit, sublime.Region(begin, end), replacement)
+        return
+    # from the end, so that the offsets of the delimiters which are not replaced yet do not move
+    for offset in reversed(offsets):
+        view.replace(edit, sublime.Region(offset, offset + 1), new_delimiter)
+
+def is_markdown_view(view: sublime.View) -> bool:
+    file_name = view.file_name()
+    if file_name is None:
+        # unsaved file
+        return view.match_selector(0, 'text.html.markdown')
+    return Path(file_name).suffix.lower() == '.md'